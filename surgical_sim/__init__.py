@@ -7,80 +7,38 @@ from typing import List
 import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
-from sim_tools.distributions import Exponential
 
-from .patients import (Patient, elective_generator, emergency_generator,
+from .analytic import OccupancyEstimate, estimate_occupancy
+from .batch import run_batched
+from .distributions import (BlockSampler, EmpiricalParameters,
+                            EmpiricalSampler, EmpiricalTable)
+from .ensemble import EnsembleAggregator, OccupancyHistogram, resample_step
+from .experiment import (DAILY, ELECTIVE_MEAN_IAT, ELECTIVE_MEAN_RECOVERY_TIME,
+                         ELECTIVE_SURGICAL_DURATION, EMERGENCY_MEAN_IAT,
+                         EMERGENCY_MEAN_RECOVERY_TIME,
+                         EMERGENCY_SURGICAL_DURATION,
+                         INITIAL_NUMBER_OF_ELECTIVE,
+                         INITIAL_NUMBER_OF_EMERGENCY, MAX_EMERGENCY_WAIT,
+                         NUM_BEDS, NUM_CC_BEDS, RUN_LENGTH, SAMPLE_BLOCK_SIZE,
+                         SEED, WEEKLY, EmpiricalExperiment, Experiment)
+from .metrics import MetricsChannel, MetricsRecorder
+from .model import (ModelInputs, RunConfig, build_schedule, single_run,
+                    summarise, theatre_slots)
+from .patients import (BreachTracker, Patient, PatientGenerator, PatientTable,
+                       PatientType, elective_generator, emergency_generator,
                        initial_elective_generator, initial_emergency_generator)
 from .processing import daily_planning, scheduler
-from .resources import surgery
+from .profiling import (ProfiledEnvironment, ProfiledSchedule, RunProfile,
+                        TimingStats)
+from .resources import (WardResource, bed_preload, initialise_ward_random,
+                        surgery)
+from .results import ResultStore, read_combined_csv, read_wide_csv
+from .runner import ReplicationResults, replication_seeds, run_replications
 from .schedule import Schedule, slot
-
-SEED = 42
-
-EMERGENCY_MEAN_IAT = 10
-EMERGENCY_SURGICAL_DURATION = 3
-EMERGENCY_MEAN_RECOVERY_TIME = 60
-
-ELECTIVE_MEAN_IAT = 16
-ELECTIVE_SURGICAL_DURATION = 2
-ELECTIVE_MEAN_RECOVERY_TIME = 48
-
-RUN_LENGTH = 480
-NUM_BEDS = 10
-NUM_CC_BEDS = 2
-
-DAILY = 24
-WEEKLY = 7 * DAILY
-
-INITIAL_NUMBER_OF_ELECTIVE = 3
-INITIAL_NUMBER_OF_EMERGENCY = 1
-
-MAX_EMERGENCY_WAIT = 48
-
-
-class Experiment:
-    def __init__(
-        self,
-        seed=SEED,
-        initial_number_of_elective=INITIAL_NUMBER_OF_ELECTIVE,
-        initial_number_of_emergency=INITIAL_NUMBER_OF_EMERGENCY,
-        elective_mean_iat=ELECTIVE_MEAN_IAT,
-        emergency_mean_iat=EMERGENCY_MEAN_IAT,
-        elective_surgical_duration=ELECTIVE_SURGICAL_DURATION,
-        emergency_surgical_duration=EMERGENCY_SURGICAL_DURATION,
-        elective_mean_recovery_time=ELECTIVE_MEAN_RECOVERY_TIME,
-        emergency_mean_recovery_time=EMERGENCY_MEAN_RECOVERY_TIME,
-        max_emergency_wait=MAX_EMERGENCY_WAIT,
-    ):
-        self.patients = []
-
-        self.initial_number_of_elective = initial_number_of_elective
-        self.initial_number_of_emergency = initial_number_of_emergency
-
-        seeds = np.random.SeedSequence(seed).spawn(6)
-
-        self.emergency_arrival_dist = Exponential(
-            emergency_mean_iat, random_seed=seeds[0]
-        )
-        self.elective_arrival_dist = Exponential(
-            elective_mean_iat, random_seed=seeds[1]
-        )
-
-        self.elective_surgical_duration_dist = Exponential(
-            elective_surgical_duration, random_seed=seeds[2]
-        )
-        self.emergency_surgical_duration_dist = Exponential(
-            emergency_surgical_duration, random_seed=seeds[3]
-        )
-
-        self.elective_recovery_time_dist = Exponential(
-            elective_mean_recovery_time, random_seed=seeds[4]
-        )
-        self.emergency_recovery_time_dist = Exponential(
-            emergency_mean_recovery_time, random_seed=seeds[5]
-        )
-
-        self.max_emergency_wait = max_emergency_wait
+from .snapshot import ModelSnapshot
+from .streaming import RunStream
+from .sweep import (ResultCache, SweepResults, input_fingerprint,
+                    replication_key, run_sweep, scenario_grid)
 
 
 ####### Logging config
@@ -115,17 +73,27 @@ class SimTimeFilter:
         return True
 
 
-def setup_logger(env, level=logging.INFO):
+def setup_logger(env, level=logging.INFO, silent=False):
     """
     Configures the root logger to include simulation time in log messages.
 
+    The simulation time is added by a filter on the handler, so it is only looked up for records
+    that pass the level check. Messages in the simulation are formatted lazily, so nothing is
+    formatted below the configured level.
+
     Args:
         env (simpy.Environment): The simulation environment used to track time.
         level (int, optional): Logging level (e.g., logging.INFO, logging.DEBUG). Defaults to logging.INFO.
+        silent (bool, optional): Switch off all logging from the simulation, e.g. for batch sweeps.
+            Each log call then returns after a single cached level check. Defaults to False.
 
     Returns:
         logging.Logger: The configured logger instance.
     """
+    logging.getLogger(__name__).setLevel(
+        logging.CRITICAL + 1 if silent else logging.NOTSET
+    )
+
     logger = logging.getLogger()
     logger.setLevel(level)
 
@@ -136,9 +104,9 @@ def setup_logger(env, level=logging.INFO):
     formatter = logging.Formatter("%(levelname)s - %(sim_time).2f - %(message)s")
 
     handler.setFormatter(formatter)
+    # Abuse the filter to add new information to the log record (sim_time)
+    handler.addFilter(SimTimeFilter(env))
 
     logger.addHandler(handler)
-    # Abuse the filter to add new information to the log record (sim_time)
-    logger.addFilter(SimTimeFilter(env))
 
     return logger
@@ -0,0 +1,384 @@
+import numpy as np
+import pandas as pd
+
+from .batch import _EmergencySlots, _PatientArrays, _plan_day
+from .distributions import PATIENT_TYPE_KEYS
+from .ensemble import DEFAULT_PERCENTILES
+from .model import RunConfig, build_schedule, referral_times, theatre_slots
+from .patients import PatientType
+
+__all__ = ["OccupancyEstimate", "estimate_occupancy"]
+
+# Patients at the front of each queue a slot may take. `Schedule.schedule_patients` books into the
+# first slot with room however far down the waiting list a patient is, so short cases from far
+# back fill the gaps that longer cases leave.
+MAX_PATIENTS_PER_SLOT = 256
+
+
+class _ReferralQueue:
+    """
+    The patients of one type referred in each replication: the waiting list, shared by every
+    replication, then arrivals drawn from the inter-arrival time table.
+
+    Only the surgery durations of the patients at the front of the queue are held. Patients a slot
+    skips stay at the front, in order, for the next slot, and durations are drawn for the patients
+    behind as those in front are operated on.
+
+    Attributes:
+        waiting (np.ndarray): Sorted arrival times of the patients on the waiting list.
+        arrivals (np.ndarray): `(n, m)` sorted arrival times of new referrals.
+        served (np.ndarray): Number of patients operated on so far in each replication.
+        durations (np.ndarray): `(n, MAX_PATIENTS_PER_SLOT)` surgery durations of the patients at the
+            front of the queue, in queue order.
+    """
+
+    def __init__(self, waiting, arrivals, duration_table, rng):
+        self.waiting = waiting
+        self.arrivals = arrivals
+        self.served = np.zeros(len(arrivals), dtype=np.int64)
+
+        self.__duration_table = duration_table
+        self.__rng = rng
+        self.durations = duration_table.sample(
+            rng, (len(arrivals), MAX_PATIENTS_PER_SLOT)
+        )
+
+    def referred_before(self, time):
+        """
+        Counts the patients referred before a time in each replication.
+        """
+        return np.searchsorted(self.waiting, time) + (self.arrivals < time).sum(axis=1)
+
+    def waiting_at(self, time):
+        """
+        Counts the patients referred before a time and not yet operated on, in each replication.
+        """
+        return self.referred_before(time) - self.served
+
+    def serve(self, taken):
+        """
+        Removes the patients operated on from the front of the queue.
+
+        Args:
+            taken (np.ndarray): `(n, MAX_PATIENTS_PER_SLOT)` whether each patient at the front was
+                operated on.
+        """
+        order = np.argsort(taken, axis=1, kind="stable")
+        self.durations = np.take_along_axis(self.durations, order, axis=1)
+
+        count = taken.sum(axis=1)
+        drawn = (
+            np.arange(MAX_PATIENTS_PER_SLOT) >= MAX_PATIENTS_PER_SLOT - count[:, None]
+        )
+        self.durations[drawn] = self.__duration_table.sample(self.__rng, drawn.sum())
+        self.served += count
+
+
+def _fill(start, remaining, durations, limit):
+    """
+    Operates on candidate patients back to back from the start of a slot.
+
+    The first `limit` candidates are taken in turn, skipping any that do not fit in the hours
+    left, as `Schedule.schedule_patients` books a patient into a slot with more hours remaining
+    than their surgery duration.
+
+    Args:
+        start (Union[float, np.ndarray]): Time the first patient's surgery starts, in each replication.
+        remaining (np.ndarray): Hours left in the slot in each replication, updated in place.
+        durations (np.ndarray): `(n, k)` surgery durations of the candidates.
+        limit (np.ndarray): Number of candidates waiting in each replication.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The replication, surgery start and
+            duration of each patient operated on, and `(n, k)` whether each candidate was taken.
+    """
+    n, k = durations.shape
+    rows = np.arange(n)
+    used = np.zeros(n)
+    taken = np.zeros(durations.shape, dtype=bool)
+    candidates = np.arange(k) < np.broadcast_to(limit, n)[:, None]
+    replications, starts, operated = [rows[:0]], [used[:0]], [used[:0]]
+
+    # Taking the first candidate that fits, again and again, is the same as taking candidates in
+    # turn, as a candidate skipped once cannot fit in fewer hours later
+    replication = rows
+    while len(replication):
+        fits = candidates[replication] & (
+            durations[replication] < remaining[replication, None]
+        )
+        found = fits.any(axis=1)
+        replication = replication[found]
+        j = fits[found].argmax(axis=1)
+        duration = durations[replication, j]
+
+        replications.append(replication)
+        starts.append((start + used)[replication])
+        operated.append(duration)
+
+        used[replication] += duration
+        remaining[replication] -= duration
+        taken[replication, j] = True
+        candidates[replication, j] = False
+
+    return (
+        np.concatenate(replications),
+        np.concatenate(starts),
+        np.concatenate(operated),
+        taken,
+    )
+
+
+def _step_counts(starts, ends, replication, n, grid):
+    """
+    Counts, at each grid time and for each replication, the stays that have started but not ended.
+
+    A stay counts from the first grid time at or after its start, matching `resample_step` on the
+    model's bed events.
+
+    Returns:
+        np.ndarray: An `(n, len(grid))` array of counts.
+    """
+    width = len(grid) + 1
+    changes = np.bincount(
+        replication * width + np.searchsorted(grid, starts, side="left"),
+        minlength=n * width,
+    ) - np.bincount(
+        replication * width + np.searchsorted(grid, ends, side="left"),
+        minlength=n * width,
+    )
+    return np.cumsum(changes.reshape(n, width), axis=1)[:, :-1]
+
+
+class OccupancyEstimate:
+    """
+    Ward occupancy of many replications, estimated without running the discrete-event model.
+
+    Attributes:
+        config (RunConfig): The scenario the estimate is for.
+        grid (np.ndarray): The times occupancy is estimated at.
+        occupancy (np.ndarray): `(n, len(grid))` beds occupied in each replication at each grid time.
+        operated (Dict[PatientType, np.ndarray]): Number of patients of each type operated on in each replication.
+    """
+
+    def __init__(self, config, grid, occupancy, operated):
+        self.config = config
+        self.grid = grid
+        self.occupancy = occupancy
+        self.operated = operated
+
+    def __len__(self):
+        return len(self.occupancy)
+
+    def exceedance(self, num_beds=None):
+        """
+        Estimates the probability that more beds are needed than the ward has, at each grid time.
+
+        Args:
+            num_beds (Optional[int]): Number of ward beds. Defaults to the scenario's `num_beds`.
+
+        Returns:
+            np.ndarray: The probability at each grid time.
+        """
+        if num_beds is None:
+            num_beds = self.config.num_beds
+        return (self.occupancy > num_beds).mean(axis=0)
+
+    def overflow_probability(self, num_beds=None):
+        """
+        Estimates the probability that more beds are needed than the ward has at some point in the run.
+
+        Args:
+            num_beds (Optional[Union[int, Iterable[int]]]): Number(s) of ward beds. Defaults to the scenario's `num_beds`.
+
+        Returns:
+            Union[float, np.ndarray]: The probability, for each number of beds.
+        """
+        if num_beds is None:
+            num_beds = self.config.num_beds
+        peaks = self.occupancy.max(axis=1)
+        probabilities = (peaks[None, :] > np.atleast_1d(num_beds)[:, None]).mean(axis=1)
+        return probabilities if np.ndim(num_beds) else probabilities.item()
+
+    def bands(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Computes percentile bands of occupancy, as `EnsembleAggregator.bands` does for the model.
+
+        Args:
+            percentiles (Iterable[float], optional): The percentiles to compute. Defaults to the median and
+                95% band.
+
+        Returns:
+            pd.DataFrame: The percentiles and mean at each grid time, indexed by "Simulation time".
+        """
+        return pd.DataFrame(
+            {
+                **{q: np.percentile(self.occupancy, q, axis=0) for q in percentiles},
+                "mean": self.occupancy.mean(axis=0),
+            },
+            index=pd.Index(self.grid, name="Simulation time"),
+        )
+
+
+def estimate_occupancy(inputs, config=RunConfig(), n=1000, grid=None, seed=None):
+    """
+    Estimates the distribution of ward occupancy over a run with numpy, for screening scenarios
+    before running the full model.
+
+    The theatre slots of the scenario's `Schedule` are filled, in hour order, from each patient
+    type's queue of waiting and newly referred patients. Emergency patients are booked when they
+    arrive into the first emergency slot with room, as `run_batched` does, and at the start of each
+    day those who would breach the maximum emergency wait, and are not booked into one of that
+    day's emergency slots, are put first into the day's other slots, displacing elective and day
+    case patients, as in `daily_planning`. Every patient operated on holds a bed from the start of
+    surgery for their surgery and a length of stay drawn from the LoS histograms, and patients
+    already on the ward hold a bed for a remaining length of stay drawn from the remaining LoS
+    histogram. All replications are drawn at once, as arrays.
+
+    Ward and critical care capacity are not enforced, so the estimate is of the demand for beds,
+    and surgery cancelled for want of a bed is not modelled. `exceedance` and
+    `overflow_probability` then show which numbers of beds the demand fits within.
+
+    Example:
+        estimate = estimate_occupancy(inputs, RunConfig(max_emergency_wait=24), n=5000)
+        estimate.overflow_probability(range(80, 101))
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+        config (RunConfig, optional): The scenario parameters. Defaults to RunConfig().
+        n (int, optional): Number of replications. Defaults to 1000.
+        grid (Optional[np.ndarray]): Times to estimate occupancy at. Defaults to every hour of the run.
+        seed (Optional[int]): Seed for the random stream. Defaults to `config.seed`.
+
+    Returns:
+        OccupancyEstimate: The occupancy of each replication.
+    """
+    if grid is None:
+        grid = np.arange(0, config.run_length + 1, dtype=float)
+    grid = np.asarray(grid, dtype=float)
+
+    rng = np.random.default_rng(config.seed if seed is None else seed)
+    parameters = inputs.parameters
+    keys = dict(zip(PatientType, PATIENT_TYPE_KEYS))
+
+    window = build_schedule(theatre_slots(inputs, config)).slots_between(
+        0, config.run_length
+    )
+    slots = [
+        (hour, PatientType(patient_type), hours_total)
+        for hour, patient_type, hours_total in zip(
+            window.hours, window.patient_types, window.hours_total
+        )
+    ]
+
+    referrals = referral_times(inputs, config.run_length, n, rng)
+    emergency = _PatientArrays(
+        PatientType.EMERGENCY, *referrals.pop(PatientType.EMERGENCY), parameters, rng
+    )
+    emergency_slots = _EmergencySlots(slots, n)
+    queues = {
+        patient_type: _ReferralQueue(
+            waiting, arrivals, parameters.surgery_duration[keys[patient_type]], rng
+        )
+        for patient_type, (waiting, arrivals) in referrals.items()
+    }
+
+    stays = {patient_type: ([], [], []) for patient_type in queues}
+
+    def operate(patient_type, start, remaining, limit):
+        queue = queues[patient_type]
+        *filled, taken = _fill(start, remaining, queue.durations, limit)
+        for column, values in zip(stays[patient_type], filled):
+            column.append(values)
+        queue.serve(taken)
+
+    def operate_emergency(start, columns, booked):
+        durations = np.where(
+            booked, np.take_along_axis(emergency.duration, columns, axis=1), 0.0
+        )
+        starts = start + np.cumsum(durations, axis=1) - durations
+        rows, positions = np.nonzero(booked)
+        emergency.surgical_time[rows, columns[rows, positions]] = starts[
+            rows, positions
+        ]
+
+    for day_start in np.arange(0, config.run_length, 24):
+        today = [
+            k for k, slot in enumerate(slots) if day_start <= slot[0] < day_start + 24
+        ]
+        emergency_slots.book(emergency, day_start)
+        _plan_day(
+            day_start,
+            today,
+            slots,
+            {PatientType.EMERGENCY: emergency},
+            emergency_slots,
+            config,
+        )
+
+        for k in today:
+            hour, patient_type, hours_total = slots[k]
+            emergency_slots.book(emergency, hour)
+
+            if patient_type == PatientType.EMERGENCY:
+                columns, booked = emergency.queue(
+                    hour, among=emergency.slot == emergency_slots.positions[k]
+                )
+                operate_emergency(hour, columns, booked)
+                continue
+
+            remaining = np.full(n, float(hours_total))
+            columns, present = emergency.queue(hour, among=emergency.placed == k)
+            operate_emergency(
+                hour, columns, emergency.book(columns, present, remaining)
+            )
+            emergency.booked[:] = False
+
+            operate(
+                patient_type,
+                hour + hours_total - remaining,
+                remaining,
+                queues[patient_type].waiting_at(hour),
+            )
+
+    rows, columns = np.nonzero(~np.isnan(emergency.surgical_time))
+    stays[PatientType.EMERGENCY] = (
+        [rows],
+        [emergency.surgical_time[rows, columns]],
+        [emergency.duration[rows, columns]],
+    )
+
+    starts, ends, replications = [], [], []
+    for patient_type, (reps, surgery_starts, durations) in stays.items():
+        surgery_starts = np.concatenate(surgery_starts)
+        los = (
+            emergency.los[rows, columns]
+            if patient_type == PatientType.EMERGENCY
+            else parameters.los[keys[patient_type]].sample(rng, len(surgery_starts))
+        )
+
+        starts.append(surgery_starts)
+        ends.append(surgery_starts + np.concatenate(durations) + los)
+        replications.append(np.concatenate(reps))
+
+    initial = inputs.initial_occupancy
+    starts.append(np.zeros(n * initial))
+    ends.append(parameters.remaining_los.sample(rng, n * initial))
+    replications.append(np.repeat(np.arange(n), initial))
+
+    occupancy = _step_counts(
+        np.concatenate(starts),
+        np.concatenate(ends),
+        np.concatenate(replications),
+        n,
+        grid,
+    )
+
+    return OccupancyEstimate(
+        config,
+        grid,
+        occupancy,
+        {
+            PatientType.EMERGENCY: (~np.isnan(emergency.surgical_time)).sum(axis=1),
+            **{patient_type: queue.served for patient_type, queue in queues.items()},
+        },
+    )
@@ -0,0 +1,480 @@
+import logging
+
+import numpy as np
+
+from .distributions import PATIENT_TYPE_KEYS
+from .model import (ModelInputs, RunConfig, build_schedule, referral_times,
+                    theatre_slots)
+from .patients import PatientType
+from .runner import ReplicationResults, replication_result, replication_seeds
+
+__all__ = ["run_batched"]
+
+logger = logging.getLogger(__name__)
+
+
+class _PatientArrays:
+    """
+    The patients of one type in every replication of a batch, as `(n, patients)` arrays.
+
+    Patients are the waiting list, shared by every replication, followed by the referrals drawn
+    from the inter-arrival time table. Waiting patients are booked in order of `key`: their
+    arrival time, or the time of their last cancellation, as cancelled patients are rebooked
+    behind the patients already booked.
+
+    Attributes:
+        patient_type (PatientType): The type of the patients.
+        arrival (np.ndarray): Arrival times.
+        duration (np.ndarray): Surgery durations.
+        los (np.ndarray): Lengths of stay after surgery.
+        key (np.ndarray): Booking order.
+        surgical_time (np.ndarray): Surgery start times, NaN until operated on.
+        cancellations (np.ndarray): Number of times each patient was cancelled.
+        booked (np.ndarray): Whether each patient is booked into a slot being dispatched.
+        slot (np.ndarray): The emergency slot each emergency patient is booked into, as a position in
+            `_EmergencySlots`: -1 until booked, and the number of emergency slots if the patient is in
+            no emergency slot of the run.
+        placed (np.ndarray): The slot of today's schedule each emergency patient was moved into by
+            today's planning, or -1.
+    """
+
+    def __init__(self, patient_type, waiting, arrivals, parameters, rng):
+        key = PATIENT_TYPE_KEYS[list(PatientType).index(patient_type)]
+        n = len(arrivals)
+
+        self.patient_type = patient_type
+        self.arrival = np.concatenate(
+            [np.broadcast_to(waiting, (n, len(waiting))), arrivals], axis=1
+        )
+        shape = self.arrival.shape
+
+        self.duration = parameters.surgery_duration[key].sample(rng, shape)
+        self.los = parameters.los[key].sample(rng, shape)
+        self.key = self.arrival.copy()
+        self.surgical_time = np.full(shape, np.nan)
+        self.cancellations = np.zeros(shape, dtype=np.int64)
+        self.booked = np.zeros(shape, dtype=bool)
+        self.slot = np.full(shape, -1)
+        self.placed = np.full(shape, -1)
+
+    def queue(self, time, among=None):
+        """
+        Orders the patients who arrived before a time and are still waiting, in booking order.
+
+        Every waiting patient is a candidate, as `Schedule.schedule_patients` books each patient into
+        the first slot with room, however far down the waiting list they are.
+
+        Args:
+            time (float): The time patients must have arrived by.
+            among (Optional[np.ndarray]): Only consider these patients. Defaults to every unbooked patient.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: `(n, patients)` column of each patient, in booking order, and
+                whether there is a waiting patient in each position.
+        """
+        waiting = (self.arrival < time) & np.isnan(self.surgical_time) & ~self.booked
+        if among is not None:
+            waiting &= among
+        keys = np.where(waiting, self.key, np.inf)
+
+        columns = np.argsort(keys, axis=1, kind="stable")
+        return columns, np.isfinite(np.take_along_axis(keys, columns, axis=1))
+
+    def book(self, columns, present, remaining):
+        """
+        Books patients into a slot in turn, skipping any that do not fit in the hours remaining, as
+        `Schedule.schedule_patients` does.
+
+        Args:
+            columns (np.ndarray): `(n, k)` patients to book, in order.
+            present (np.ndarray): Whether there is a patient in each position.
+            remaining (np.ndarray): Hours remaining in the slot in each replication, updated in place.
+
+        Returns:
+            np.ndarray: `(n, k)` whether each patient was booked.
+        """
+        booked = np.zeros(columns.shape, dtype=bool)
+        rows = np.arange(len(columns))
+        shortest = self.duration.min(initial=np.inf)
+        for j in range(columns.shape[1]):
+            if not (present[:, j] & (remaining > shortest)).any():
+                break
+            duration = self.duration[rows, columns[:, j]]
+            booked[:, j] = present[:, j] & (duration < remaining)
+            remaining -= np.where(booked[:, j], duration, 0.0)
+            self.booked[rows[booked[:, j]], columns[booked[:, j], j]] = True
+        return booked
+
+    def cancel(self, rows, columns, time):
+        """
+        Records cancellations, moving the patients to the back of the booking order to be booked
+        again.
+        """
+        self.cancellations[rows, columns] += 1
+        self.key[rows, columns] = time
+        self.slot[rows, columns] = -1
+        self.placed[rows, columns] = -1
+
+
+class _EmergencySlots:
+    """
+    The emergency slots of the run in every replication, and the hours remaining in each.
+
+    Emergency patients are booked when they arrive, or when they are cancelled, into the first
+    emergency slot after that time with room, as `Schedule.schedule_patients` does, so daily
+    planning can tell which breaching patients are already booked into one of the day's slots.
+
+    Attributes:
+        positions (Dict[int, int]): Position among the emergency slots of each emergency slot in the
+            run's list of slots.
+        hours (np.ndarray): Start hour of each emergency slot, in order.
+        remaining (np.ndarray): `(n, slots)` hours remaining in each slot.
+    """
+
+    def __init__(self, slots, n):
+        emergency = [
+            k
+            for k, (_, patient_type, _) in enumerate(slots)
+            if patient_type == PatientType.EMERGENCY
+        ]
+        self.positions = {k: i for i, k in enumerate(emergency)}
+        self.hours = np.array([slots[k][0] for k in emergency], dtype=float)
+        self.remaining = np.tile(
+            np.array([slots[k][2] for k in emergency], dtype=float), (n, 1)
+        )
+
+    def book(self, patients, time):
+        """
+        Books the emergency patients referred or cancelled before a time who are not yet booked, in
+        booking order.
+
+        The waiting list is booked at the start of the run, so the first slot it can take is the
+        first after time 0. A patient with no room in any slot of the run is booked after it.
+
+        Args:
+            patients (_PatientArrays): The emergency patients.
+            time (float): The time patients must have been referred or cancelled by.
+        """
+        pending = (
+            (patients.slot == -1)
+            & np.isnan(patients.surgical_time)
+            & (patients.key < time)
+        )
+        keys = np.where(pending, patients.key, np.inf)
+        columns = np.argsort(keys, axis=1, kind="stable")
+        present = np.isfinite(np.take_along_axis(keys, columns, axis=1))
+
+        for j in range(present.sum(axis=1).max(initial=0)):
+            rows = np.flatnonzero(present[:, j])
+            column = columns[rows, j]
+            booked_at = np.maximum(patients.key[rows, column], 0.0)
+            duration = patients.duration[rows, column]
+
+            first = np.searchsorted(self.hours, booked_at.min(), side="right")
+            fits = (self.hours[first:] > booked_at[:, None]) & (
+                self.remaining[rows, first:] > duration[:, None]
+            )
+            found = fits.any(axis=1)
+            slot = np.where(found, first + fits.argmax(axis=1), len(self.hours))
+
+            self.remaining[rows[found], slot[found]] -= duration[found]
+            patients.slot[rows, column] = slot
+
+    def release(self, patients, rows, columns):
+        """
+        Takes emergency patients out of their emergency slots, returning the hours they held.
+        """
+        slot = patients.slot[rows, columns]
+        held = slot < len(self.hours)
+        np.add.at(
+            self.remaining,
+            (rows[held], slot[held]),
+            patients.duration[rows[held], columns[held]],
+        )
+        patients.slot[rows, columns] = len(self.hours)
+
+
+class _Theatre:
+    """
+    One slot being dispatched in every replication: its patients in order and the time each
+    replication's theatre has reached.
+    """
+
+    def __init__(self, hour, hours_total, n):
+        self.end = hour + hours_total
+        self.now = np.full(n, float(hour))
+        self.patients = []
+
+    def add(self, patients, columns, booked):
+        # Move the booked patients to the front, in order, and drop positions no replication uses
+        order = np.argsort(~booked, axis=1, kind="stable")
+        columns = np.take_along_axis(columns, order, axis=1)
+        booked = np.take_along_axis(booked, order, axis=1)
+        for j in range(booked.sum(axis=1).max(initial=0)):
+            self.patients.append((patients, columns[:, j], booked[:, j]))
+
+
+class _Ward:
+    """
+    Ward and critical care beds of every replication, as the time each bed is next free.
+    """
+
+    def __init__(self, num_beds, num_cc_beds, remaining_los, n):
+        self.beds = np.zeros((n, num_beds))
+        self.cc_beds = np.zeros((n, num_cc_beds))
+        self.rows = np.arange(n)
+
+        # Patients already on the ward take the first free bed in turn
+        for stay in remaining_los.T:
+            bed = self.beds.argmin(axis=1)
+            self.beds[self.rows, bed] += stay
+
+    def operate(self, theatre, patients, columns, booked):
+        """
+        Sends one patient per replication to surgery, following the rules of `resources.surgery`.
+
+        A patient waits for a critical care bed, then a ward bed, each for as long as surgery could
+        still end an hour before the end of the slot; if either wait runs out, they are cancelled
+        and rebooked. Otherwise they hold the critical care bed during surgery, and the ward bed for
+        surgery and their length of stay.
+        """
+        rows = self.rows
+        duration = patients.duration[rows, columns]
+        latest = theatre.end - duration - 1
+
+        cc_bed = self.cc_beds.argmin(axis=1)
+        cc_time = np.maximum(theatre.now, self.cc_beds[rows, cc_bed])
+        has_cc_bed = booked & (cc_time <= np.maximum(latest, theatre.now))
+
+        bed = self.beds.argmin(axis=1)
+        start = np.maximum(cc_time, self.beds[rows, bed])
+        operated = has_cc_bed & (start <= np.maximum(latest, cc_time))
+
+        end = start + duration
+        self.beds[rows[operated], bed[operated]] = (end + patients.los[rows, columns])[
+            operated
+        ]
+        self.cc_beds[rows[operated], cc_bed[operated]] = end[operated]
+        patients.surgical_time[rows[operated], columns[operated]] = start[operated]
+
+        # Cancelled patients leave when their wait for a bed times out
+        cancelled = booked & ~operated
+        gave_up = np.where(
+            has_cc_bed, np.maximum(latest, cc_time), np.maximum(latest, theatre.now)
+        )
+        waited = has_cc_bed & ~operated
+        self.cc_beds[rows[waited], cc_bed[waited]] = gave_up[waited]
+        patients.cancel(rows[cancelled], columns[cancelled], gave_up[cancelled])
+
+        theatre.now = np.where(operated, end, np.where(cancelled, gave_up, theatre.now))
+
+
+def _plan_day(day_start, today, slots, patients, emergency_slots, config):
+    """
+    Moves the emergency patients who will breach within the day, and are not booked into one of the
+    day's emergency slots, into the day's other slots, as `daily_planning` does.
+
+    Each is taken out of the emergency slot they were booked into, and placed in the first of the
+    day's other slots that the patients already placed leave room for.
+
+    Args:
+        day_start (float): Start of the day.
+        today (List[int]): Positions in `slots` of the day's slots.
+        slots (List[Tuple[float, PatientType, float]]): The hour, patient type and hours total of each slot.
+        patients (Dict[PatientType, _PatientArrays]): The patients of each type.
+        emergency_slots (_EmergencySlots): The emergency slots the emergency patients are booked into.
+        config (RunConfig): The scenario parameters.
+    """
+    emergency = patients[PatientType.EMERGENCY]
+    booked_today = np.isin(
+        emergency.slot,
+        [emergency_slots.positions[k] for k in today if k in emergency_slots.positions],
+    )
+    breaching = (
+        (emergency.arrival <= day_start)
+        & np.isnan(emergency.surgical_time)
+        & ~booked_today
+        & (emergency.arrival + config.max_emergency_wait < day_start + 24)
+    )
+
+    for k in today:
+        if k in emergency_slots.positions:
+            continue
+        columns, present = emergency.queue(day_start, among=breaching)
+        booked = emergency.book(columns, present, np.full(len(columns), slots[k][2]))
+
+        rows, positions = np.nonzero(booked)
+        emergency.placed[rows, columns[rows, positions]] = k
+        breaching[rows, columns[rows, positions]] = False
+
+    rows, columns = np.nonzero(emergency.booked)
+    emergency_slots.release(emergency, rows, columns)
+    emergency.booked[:] = False
+
+
+def _summarise(patients, config):
+    """
+    Computes `SUMMARY_METRICS` for each replication from the patient arrays.
+    """
+    summary = {}
+    for patient_type, arrays in patients.items():
+        name = patient_type.value.lower()
+        seen = ~np.isnan(arrays.surgical_time)
+        waits = np.where(seen, arrays.surgical_time - arrays.arrival, 0.0)
+
+        summary[f"{name}_patients_seen"] = seen.sum(axis=1)
+        summary[f"{name}_patients_cancelled"] = (arrays.cancellations > 0).sum(axis=1)
+        summary[f"{name}_surgery"] = np.where(seen, arrays.duration, 0.0).sum(axis=1)
+        summary[f"{name}_cancellations"] = arrays.cancellations.sum(axis=1)
+        summary[f"{name}_wait"] = waits.sum(axis=1)
+        summary[f"{name}_breaches"] = (
+            (seen & (waits > config.max_emergency_wait)).sum(axis=1)
+            if patient_type == PatientType.EMERGENCY
+            else np.zeros(len(seen), dtype=np.int64)
+        )
+        summary[f"{name}_discharged"] = (
+            seen
+            & (arrays.surgical_time + arrays.duration + arrays.los <= config.run_length)
+        ).sum(axis=1)
+    return summary
+
+
+def run_batched(config=RunConfig(), n=100, inputs=None):
+    """
+    Runs replications of a scenario in lockstep, as numpy arrays with one row per replication,
+    rather than as one SimPy model per replication.
+
+    The batch steps through the theatre sessions in hour order. At each session every replication
+    books its waiting patients first-fit into the session's slots, and sends them to surgery in
+    turn under the rules of `resources.surgery`, with the ward and critical care beds held as the
+    time each is next free. Emergency patients are instead booked when they arrive, or are
+    cancelled, into the first emergency slot with room, as `Schedule.schedule_patients` does. Each
+    day starts with `daily_planning`'s rule: emergency patients due to breach the maximum wait, who
+    are not booked into one of the day's emergency slots, are put at the front of the day's other
+    slots, and the elective and day case patients they displace are cancelled.
+
+    Replications are not seed for seed the same as those of `run_replications`: the whole batch
+    draws from one random stream seeded by `config.seed`, and the seeds in the results only label
+    the replications. Slots that run in parallel are dispatched a patient at a time in turn, and
+    beds are given to the patient dispatched first rather than the one who asked first, so when the
+    ward is short of beds, several per cent more patients are operated on than in the full model.
+    Occupancy step functions are not kept.
+
+    Args:
+        config (RunConfig, optional): The scenario parameters. Defaults to RunConfig().
+        n (int, optional): Number of replications. Defaults to 100.
+        inputs (ModelInputs, optional): The model inputs. Defaults to those in the repository's `data/` directory.
+
+    Returns:
+        ReplicationResults: The summary metrics of every replication.
+    """
+    if inputs is None:
+        inputs = ModelInputs.from_directory()
+
+    rng = np.random.default_rng(config.seed)
+    parameters = inputs.parameters
+
+    patients = {
+        patient_type: _PatientArrays(patient_type, waiting, arrivals, parameters, rng)
+        for patient_type, (waiting, arrivals) in referral_times(
+            inputs, config.run_length, n, rng
+        ).items()
+    }
+    ward = _Ward(
+        config.num_beds,
+        config.num_cc_beds,
+        parameters.remaining_los.sample(rng, (n, inputs.initial_occupancy)),
+        n,
+    )
+
+    window = build_schedule(theatre_slots(inputs, config)).slots_between(
+        0, config.run_length
+    )
+    slots = [
+        (hour, PatientType(patient_type), hours_total)
+        for hour, patient_type, hours_total in zip(
+            window.hours, window.patient_types, window.hours_total
+        )
+    ]
+    emergency = patients[PatientType.EMERGENCY]
+    emergency_slots = _EmergencySlots(slots, n)
+
+    day_start = None
+    for hour in np.unique(window.hours):
+        if day_start is None or hour >= day_start + 24:
+            day_start = hour // 24 * 24
+            emergency_slots.book(emergency, day_start)
+            _plan_day(
+                day_start,
+                [
+                    k
+                    for k, slot in enumerate(slots)
+                    if day_start <= slot[0] < day_start + 24
+                ],
+                slots,
+                patients,
+                emergency_slots,
+                config,
+            )
+            logger.info("Day %s planned", day_start)
+
+        emergency_slots.book(emergency, hour)
+
+        theatres = []
+        for k, (slot_hour, patient_type, hours_total) in enumerate(slots):
+            if slot_hour != hour:
+                continue
+
+            theatre = _Theatre(hour, hours_total, n)
+            remaining = np.full(n, float(hours_total))
+            own = patients[patient_type]
+
+            if patient_type != PatientType.EMERGENCY:
+                columns, present = emergency.queue(hour, among=emergency.placed == k)
+                theatre.add(
+                    emergency, columns, emergency.book(columns, present, remaining)
+                )
+
+                # As in `daily_planning`, the patients booked last are bumped to make room
+                columns, present = own.queue(hour)
+                booked = own.book(columns, present, np.full(n, float(hours_total)))
+                booked_hours = np.cumsum(
+                    np.where(
+                        booked, np.take_along_axis(own.duration, columns, axis=1), 0.0
+                    ),
+                    axis=1,
+                )
+                rows, positions = np.nonzero(
+                    booked & (booked_hours > remaining[:, None])
+                )
+                booked[rows, positions] = False
+                own.booked[rows, columns[rows, positions]] = False
+                own.cancel(rows, columns[rows, positions], day_start)
+            else:
+                columns, booked = own.queue(
+                    hour, among=own.slot == emergency_slots.positions[k]
+                )
+
+            theatre.add(own, columns, booked)
+            theatres.append(theatre)
+
+        for j in range(max(len(theatre.patients) for theatre in theatres)):
+            for theatre in theatres:
+                if j < len(theatre.patients):
+                    ward.operate(theatre, *theatre.patients[j])
+
+        for arrays in patients.values():
+            arrays.booked[:] = False
+
+    summary = _summarise(patients, config)
+    seeds = replication_seeds(config.seed, n)
+
+    return ReplicationResults(
+        config,
+        [
+            replication_result(
+                seed, {metric: values[i] for metric, values in summary.items()}, None
+            )
+            for i, seed in enumerate(seeds)
+        ],
+    )
@@ -0,0 +1,414 @@
+import argparse
+import dataclasses
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import simpy
+
+from .experiment import EmpiricalExperiment
+from .metrics import MetricsRecorder
+from .model import (ModelInputs, RunConfig, book_waiting_lists, build_schedule,
+                    patient_generators, start_processes, theatre_slots)
+from .processing import daily_planning
+from .resources import WardResource, initialise_ward_random
+
+__all__ = ["BenchmarkScale", "run_benchmarks", "synthetic_inputs"]
+
+BENCHMARK_CASES = [
+    "schedule_patients",
+    "horizon_growth",
+    "find_cancel",
+    "daily_planning",
+    "single_run",
+]
+
+# The values each scaling axis is swept over, one axis at a time from `BenchmarkScale()`
+SCALING_AXES = {
+    "wait_list_size": [100, 300, 1000, 3000, 10000],
+    "theatres": [1, 2, 4, 8],
+    "run_days": [7, 14, 28, 56],
+}
+
+benchmark_timing = namedtuple(
+    "benchmark_timing", ["seconds", "operations", "peak_memory"]
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkScale:
+    """
+    The size of the synthetic model a benchmark runs against.
+
+    Attributes:
+        wait_list_size (int): Number of elective and day case patients on the waiting list.
+        theatres (int): Number of copies of the theatre schedule run side by side.
+        run_days (int): Length of a run, and of the schedule horizon, in days.
+    """
+
+    wait_list_size: int = 1000
+    theatres: int = 1
+    run_days: int = 14
+
+
+class _CountingEnvironment(simpy.Environment):
+    """
+    A SimPy environment that counts the events it processes.
+    """
+
+    def __init__(self, initial_time=0):
+        super().__init__(initial_time)
+        self.events_processed = 0
+
+    def step(self):
+        self.events_processed += 1
+        super().step()
+
+
+def synthetic_inputs(base, wait_list_size, theatres=1, seed=0):
+    """
+    Scales model inputs up or down for benchmarking.
+
+    The waiting lists are resampled, with replacement, from the base waiting lists, keeping the mix
+    of inpatients and day cases; the emergency waiting list is scaled in proportion. The theatre
+    schedule is repeated once per theatre, so every session runs `theatres` times in parallel.
+
+    Args:
+        base (ModelInputs): The inputs to scale, e.g. `ModelInputs.from_directory()`.
+        wait_list_size (int): Number of elective and day case patients on the waiting list.
+        theatres (int, optional): Number of copies of the theatre schedule. Defaults to 1.
+        seed (int, optional): Seed for the resampling. Defaults to 0.
+
+    Returns:
+        ModelInputs: The scaled inputs, sharing the base parameters.
+    """
+    rng = np.random.default_rng(seed)
+
+    def resample(wait_list, size):
+        rows = np.sort(rng.choice(len(wait_list), size=size))
+        return wait_list.iloc[rows].sort_values(
+            by="hours_waited", ascending=False, kind="stable"
+        )
+
+    scale = wait_list_size / max(len(base.wait_list), 1)
+
+    return dataclasses.replace(
+        base,
+        theatre_schedule=pd.concat(
+            [base.theatre_schedule] * theatres, ignore_index=True
+        ),
+        wait_list=resample(base.wait_list, wait_list_size).reset_index(drop=True),
+        emergency_wait_list=resample(
+            base.emergency_wait_list,
+            max(1, round(len(base.emergency_wait_list) * scale)),
+        ),
+    )
+
+
+def _booked_model(inputs, config, seed):
+    """
+    Initialises a replication without running it: an experiment, and a schedule with the waiting lists booked.
+
+    Returns:
+        Tuple[simpy.Environment, EmpiricalExperiment, Schedule]: The environment, experiment and schedule.
+    """
+    env = _CountingEnvironment()
+    experiment = EmpiricalExperiment(
+        inputs.parameters, seed=seed, max_emergency_wait=config.max_emergency_wait
+    )
+    schedule = build_schedule(theatre_slots(inputs, config))
+    book_waiting_lists(
+        env, inputs, experiment, schedule, patient_generators(experiment)
+    )
+    return env, experiment, schedule
+
+
+def bench_schedule_patients(inputs, config, seed):
+    """
+    Books every waiting list patient into an empty schedule with one `schedule_patients` call.
+    """
+    _, experiment, schedule = _booked_model(inputs, config, seed)
+    empty = build_schedule(theatre_slots(inputs, config))
+    patients = experiment.patients
+
+    def run():
+        empty.schedule_patients(patients, 0)
+        return len(patients)
+
+    return run
+
+
+def bench_horizon_growth(inputs, config, seed):
+    """
+    Reads every session of an empty schedule up to the end of the run, as the theatre scheduler
+    does, growing the horizon as it goes.
+    """
+    schedule = build_schedule(theatre_slots(inputs, config))
+
+    def run():
+        lookups = 0
+        for hour in schedule.sessions(0):
+            if hour >= config.run_length:
+                return lookups
+            schedule.slots_at(hour)
+            lookups += 1
+
+    return run
+
+
+def bench_find_cancel(inputs, config, seed):
+    """
+    Looks up then cancels every booked patient.
+    """
+    _, experiment, schedule = _booked_model(inputs, config, seed)
+    patients = experiment.patients
+
+    def run():
+        for patient in patients:
+            schedule.find_patient(patient)
+            schedule.cancel_patient(patient)
+        return len(patients)
+
+    return run
+
+
+def bench_daily_planning(inputs, config, seed):
+    """
+    Runs the first day's planning, rebooking the emergency patients due to breach.
+    """
+    env, experiment, schedule = _booked_model(inputs, config, seed)
+    beds = WardResource(env, capacity=config.num_beds)
+    env.process(daily_planning(env, beds, schedule, experiment))
+
+    def run():
+        env.run(until=1)
+        return len(inputs.emergency_wait_list)
+
+    return run
+
+
+def bench_single_run(inputs, config, seed):
+    """
+    Runs a whole replication, from initialisation to the end of the run, counting simulation events.
+    """
+    schedule = build_schedule(theatre_slots(inputs, config))
+
+    def run():
+        experiment = EmpiricalExperiment(
+            inputs.parameters, seed=seed, max_emergency_wait=config.max_emergency_wait
+        )
+        generators = patient_generators(experiment)
+        metrics = MetricsRecorder()
+        env = _CountingEnvironment()
+
+        beds = WardResource(env, capacity=config.num_beds)
+        cc_beds = simpy.Resource(env, capacity=config.num_cc_beds)
+
+        initialise_ward_random(env, beds, inputs.initial_occupancy, experiment, metrics)
+        book_waiting_lists(env, inputs, experiment, schedule, generators)
+        start_processes(env, beds, cc_beds, experiment, schedule, generators, metrics)
+
+        env.run(until=config.run_length)
+        return env.events_processed
+
+    return run
+
+
+# The function that sets up each case, returning a callable to time that returns its operation count
+_CASES = {
+    "schedule_patients": bench_schedule_patients,
+    "horizon_growth": bench_horizon_growth,
+    "find_cancel": bench_find_cancel,
+    "daily_planning": bench_daily_planning,
+    "single_run": bench_single_run,
+}
+
+
+def time_case(case, inputs, config, repeats=3, seed=0):
+    """
+    Times a benchmark case, then measures its peak memory in a separate untimed run.
+
+    Each repeat sets the case up afresh, and only the measured call is timed.
+
+    Args:
+        case (str): One of `BENCHMARK_CASES`.
+        inputs (ModelInputs): The model inputs.
+        config (RunConfig): The scenario parameters.
+        repeats (int, optional): Number of timed runs. Defaults to 3.
+        seed (int, optional): Seed for the replication. Defaults to 0.
+
+    Returns:
+        benchmark_timing: The time of each run in seconds, the operations per run and the peak
+            memory allocated during a run, in bytes.
+    """
+    setup = _CASES[case]
+
+    seconds = []
+    for _ in range(repeats):
+        run = setup(inputs, config, seed)
+        start = time.perf_counter()
+        operations = run()
+        seconds.append(time.perf_counter() - start)
+
+    run = setup(inputs, config, seed)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return benchmark_timing(seconds, operations, peak_memory)
+
+
+def _scaling_exponent(x, seconds):
+    """
+    Fits `seconds ~ x ** k` by least squares on log scales, returning k.
+    """
+    if len(x) < 2:
+        return None
+    return float(np.polyfit(np.log(x), np.log(seconds), 1)[0])
+
+
+def run_benchmarks(
+    base=None,
+    cases=BENCHMARK_CASES,
+    axes=SCALING_AXES,
+    default=BenchmarkScale(),
+    repeats=3,
+    seed=0,
+):
+    """
+    Times each benchmark case as each scaling axis is swept, with the other axes at their defaults.
+
+    Example:
+        report = run_benchmarks(axes={"wait_list_size": [100, 1000, 10000]})
+        report["curves"]["schedule_patients"]["wait_list_size"]["exponent"]
+
+    Args:
+        base (ModelInputs, optional): The inputs to scale. Defaults to those in the repository's `data/` directory.
+        cases (Iterable[str], optional): The cases to run. Defaults to `BENCHMARK_CASES`.
+        axes (Dict[str, List[int]], optional): The values of each `BenchmarkScale` field to sweep.
+            Defaults to `SCALING_AXES`.
+        default (BenchmarkScale, optional): The scale of the axes not being swept. Defaults to BenchmarkScale().
+        repeats (int, optional): Number of timed runs of each case and scale. Defaults to 3.
+        seed (int, optional): Seed for the synthetic inputs and replications. Defaults to 0.
+
+    Returns:
+        Dict[str, Any]: JSON-serialisable report, with the environment under "machine", one record per
+            case and scale under "results" and, for each case and axis, the fastest times and fitted
+            scaling exponent under "curves".
+    """
+    if base is None:
+        base = ModelInputs.from_directory()
+
+    package_logger = logging.getLogger(__package__)
+    level = package_logger.level
+    package_logger.setLevel(logging.CRITICAL + 1)
+
+    results = []
+    curves = {case: {} for case in cases}
+    try:
+        for axis, values in axes.items():
+            for value in values:
+                scale = dataclasses.replace(default, **{axis: value})
+                inputs = synthetic_inputs(
+                    base, scale.wait_list_size, scale.theatres, seed=seed
+                )
+                config = RunConfig(run_length=scale.run_days * 24)
+
+                for case in cases:
+                    timing = time_case(case, inputs, config, repeats, seed)
+                    best = min(timing.seconds)
+                    results.append(
+                        {
+                            "case": case,
+                            "axis": axis,
+                            **dataclasses.asdict(scale),
+                            "slots": len(inputs.theatre_schedule),
+                            "seconds": timing.seconds,
+                            "best_seconds": best,
+                            "operations": timing.operations,
+                            "operations_per_second": (
+                                timing.operations / best if best > 0 else None
+                            ),
+                            "peak_memory_bytes": timing.peak_memory,
+                        }
+                    )
+
+                    curve = curves[case].setdefault(axis, {"x": [], "seconds": []})
+                    curve["x"].append(value)
+                    curve["seconds"].append(best)
+    finally:
+        package_logger.setLevel(level)
+
+    for case_curves in curves.values():
+        for curve in case_curves.values():
+            curve["exponent"] = _scaling_exponent(curve["x"], curve["seconds"])
+
+    return {
+        "machine": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "simpy": simpy.__version__,
+        },
+        "repeats": repeats,
+        "default_scale": dataclasses.asdict(default),
+        "results": results,
+        "curves": curves,
+    }
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks from the command line and writes the report as JSON.
+
+    Example:
+        python -m surgical_sim.benchmark --output benchmark.json --quick
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", "-o", default="benchmark.json")
+    parser.add_argument("--cases", nargs="+", choices=BENCHMARK_CASES)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Sweep only the smallest two values of each axis.",
+    )
+    args = parser.parse_args(argv)
+
+    axes = (
+        {axis: values[:2] for axis, values in SCALING_AXES.items()}
+        if args.quick
+        else SCALING_AXES
+    )
+    report = run_benchmarks(
+        cases=args.cases or BENCHMARK_CASES,
+        axes=axes,
+        repeats=args.repeats,
+        seed=args.seed,
+    )
+
+    with open(args.output, "w") as fout:
+        json.dump(report, fout, indent=2)
+
+    for record in report["results"]:
+        print(
+            f"{record['case']:>18} {record['axis']:>15}={record[record['axis']]:<6} "
+            f"{record['best_seconds']:.4f}s {record['peak_memory_bytes'] / 1e6:.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+import copy
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["BlockSampler", "EmpiricalParameters", "EmpiricalSampler", "EmpiricalTable"]
+
+# Keys of the per-type histograms in the parameter files
+PATIENT_TYPE_KEYS = ["EMERG", "ELECT", "DCASE"]
+
+# Parameter files in the data directory, and the name of each histogram set
+PARAMETER_FILES = {
+    "iat": "iats.json",
+    "surgery_duration": "surgery_durations.json",
+    "los": "los.json",
+    "remaining_los": "remaining_los.json",
+}
+
+DEFAULT_BLOCK_SIZE = 256
+
+
+class BlockSampler:
+    """
+    Hands out samples from a distribution, drawing them from its random stream in vectorised blocks.
+
+    The wrapped distributions draw vectors from their generator in the same order as repeated
+    scalar draws, so a block sampler returns exactly the same sequence of values as calling the
+    distribution's `sample()` one value at a time. Seeded runs are therefore unchanged, and
+    common random numbers between scenarios still hold.
+
+    Attributes:
+        dist (Any): The wrapped distribution, with a `sample(size)` method.
+        block_size (int): Number of values drawn from the distribution at a time.
+    """
+
+    def __init__(self, dist, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Initializes the sampler with an empty buffer.
+
+        Args:
+            dist (Any): The distribution to draw from, with a `sample(size)` method.
+            block_size (int, optional): Number of values to draw at a time. Defaults to 256.
+        """
+        self.dist = dist
+        self.block_size = block_size
+
+        self.__buffer = []
+        self.__position = 0
+
+    def copy(self):
+        """
+        Copies the sampler, so that the copy continues the same random stream independently.
+
+        Returns:
+            BlockSampler: The copy.
+        """
+        sampler = BlockSampler.__new__(BlockSampler)
+        sampler.dist = (
+            self.dist.copy() if hasattr(self.dist, "copy") else copy.deepcopy(self.dist)
+        )
+        sampler.block_size = self.block_size
+        # Buffers are replaced rather than modified, so the copy can share this one
+        sampler.__buffer = self.__buffer
+        sampler.__position = self.__position
+        return sampler
+
+    def __refill(self):
+        """
+        Draws the next block of values from the distribution.
+        """
+        self.__buffer = np.atleast_1d(self.dist.sample(self.block_size)).tolist()
+        self.__position = 0
+
+    def sample(self, size=None):
+        """
+        Returns the next value(s) in the distribution's random stream.
+
+        Args:
+            size (Optional[Union[int, Tuple[int, ...]]]): Number or shape of samples. If None, a
+                single value is returned.
+
+        Returns:
+            Union[float, np.ndarray]: A single sample, or an array of samples.
+        """
+        if size is None:
+            if self.__position == len(self.__buffer):
+                self.__refill()
+            value = self.__buffer[self.__position]
+            self.__position += 1
+            return value
+
+        total = int(np.prod(size))
+        buffered = self.__buffer[self.__position : self.__position + total]
+        self.__position += len(buffered)
+
+        samples = np.asarray(buffered, dtype=float)
+        if len(buffered) < total:
+            drawn = np.atleast_1d(self.dist.sample(total - len(buffered)))
+            samples = np.concatenate([samples, drawn.astype(float)])
+
+        return samples.reshape(size)
+
+
+class EmpiricalTable:
+    """
+    A histogram compiled into an inverse-CDF sampling table.
+
+    A grouped table interpolates linearly within the bin a uniform draw falls in, as
+    `GroupedContinuousEmpirical` does; a discrete table returns the value of that bin, as
+    `DiscreteEmpirical` does. The arithmetic matches both, so a table fed the same random stream
+    returns exactly the same samples, but it is vectorised and only built once.
+
+    Attributes:
+        cdf (np.ndarray): Cumulative probability at the upper end of each bin.
+        lower (np.ndarray): Lower bound of each bin for a grouped table, or the value of each bin for a
+            discrete one.
+        upper (Optional[np.ndarray]): Upper bound of each bin for a grouped table, None for a discrete one.
+    """
+
+    __slots__ = ("cdf", "lower", "upper")
+
+    def __init__(self, cdf, lower, upper=None):
+        """
+        Initializes the table from its compiled arrays.
+
+        Args:
+            cdf (np.ndarray): Cumulative probability at the upper end of each bin.
+            lower (np.ndarray): Lower bounds (grouped) or values (discrete) of each bin.
+            upper (Optional[np.ndarray]): Upper bounds of each bin, for a grouped table.
+        """
+        self.cdf = cdf
+        self.lower = lower
+        self.upper = upper
+
+    @classmethod
+    def grouped(cls, histogram):
+        """
+        Compiles a histogram for sampling continuously within its bins.
+
+        Args:
+            histogram (Tuple[np.ndarray, np.ndarray]): `(frequencies, bin_edges)` pair.
+
+        Returns:
+            EmpiricalTable: The grouped table.
+        """
+        freq = np.asarray(histogram[0], dtype=float)
+        edges = np.asarray(histogram[1], dtype=float)
+        return cls(np.cumsum(freq / freq.sum(), dtype=float), edges[:-1], edges[1:])
+
+    @classmethod
+    def midpoints(cls, histogram):
+        """
+        Compiles a histogram for sampling the midpoints of its non-empty bins.
+
+        Args:
+            histogram (Tuple[np.ndarray, np.ndarray]): `(frequencies, bin_edges)` pair.
+
+        Returns:
+            EmpiricalTable: The discrete table.
+        """
+        freq = np.asarray(histogram[0])
+        edges = np.asarray(histogram[1], dtype=float)
+        mask = freq > 0
+
+        # Normalised as `Generator.choice` does
+        cdf = (freq[mask] / freq[mask].sum()).cumsum()
+        cdf /= cdf[-1]
+        return cls(cdf, ((edges[:-1] + edges[1:]) / 2)[mask])
+
+    @property
+    def is_grouped(self):
+        """
+        bool: Whether samples are interpolated within bins.
+        """
+        return self.upper is not None
+
+    def sample(self, rng, size=None):
+        """
+        Draws samples by inverting the table's CDF.
+
+        Args:
+            rng (np.random.Generator): The random stream to draw from.
+            size (Optional[Union[int, Tuple[int, ...]]]): Number or shape of samples. If None, a
+                single value is returned.
+
+        Returns:
+            Union[float, np.ndarray]: A single sample, or an array of samples.
+        """
+        u = np.atleast_1d(rng.random(size))
+
+        if self.is_grouped:
+            idx = np.searchsorted(self.cdf, u)
+            prev = np.where(idx == 0, 0.0, self.cdf[np.maximum(idx - 1, 0)])
+            samples = self.lower[idx] + (u - prev) / (self.cdf[idx] - prev) * (
+                self.upper[idx] - self.lower[idx]
+            )
+        else:
+            samples = self.lower[np.searchsorted(self.cdf, u, side="right")]
+
+        return samples[0].item() if size is None else samples.reshape(size)
+
+
+class EmpiricalSampler:
+    """
+    A seeded random stream over a shared, read-only `EmpiricalTable`.
+
+    Attributes:
+        table (EmpiricalTable): The compiled table.
+        rng (np.random.Generator): The sampler's random stream.
+    """
+
+    def __init__(self, table, random_seed=None):
+        """
+        Initializes the sampler.
+
+        Args:
+            table (EmpiricalTable): The compiled table.
+            random_seed (Optional[Union[int, np.random.SeedSequence]]): Seed of the random stream.
+        """
+        self.table = table
+        self.rng = np.random.default_rng(random_seed)
+
+    def copy(self):
+        """
+        Copies the sampler's random stream, sharing its read-only table.
+
+        Returns:
+            EmpiricalSampler: The copy.
+        """
+        sampler = EmpiricalSampler.__new__(EmpiricalSampler)
+        sampler.table = self.table
+        sampler.rng = copy.deepcopy(self.rng)
+        return sampler
+
+    def sample(self, size=None):
+        """
+        Draws samples from the table.
+
+        Args:
+            size (Optional[Union[int, Tuple[int, ...]]]): Number or shape of samples. If None, a
+                single value is returned.
+
+        Returns:
+            Union[float, np.ndarray]: A single sample, or an array of samples.
+        """
+        return self.table.sample(self.rng, size)
+
+
+class EmpiricalParameters:
+    """
+    The empirical histograms of the model, compiled into sampling tables.
+
+    Inter-arrival times and lengths of stay are grouped tables; surgery durations are discrete
+    tables of bin midpoints. Compiled parameters can be saved to and loaded from a single `.npz`
+    file, which avoids re-parsing the JSON histograms.
+
+    Attributes:
+        iat (Dict[str, EmpiricalTable]): Inter-arrival time tables, keyed by "EMERG", "ELECT" and "DCASE".
+        surgery_duration (Dict[str, EmpiricalTable]): Surgery duration tables, keyed by patient type.
+        los (Dict[str, EmpiricalTable]): Length of stay tables, keyed by patient type.
+        remaining_los (EmpiricalTable): Remaining length of stay table for patients on the ward at the start.
+        fingerprint (str): Hash of the histograms the tables were compiled from.
+    """
+
+    def __init__(self, iat, surgery_duration, los, remaining_los, fingerprint=""):
+        """
+        Initializes the parameters from compiled tables.
+
+        Args:
+            iat (Dict[str, EmpiricalTable]): Inter-arrival time tables.
+            surgery_duration (Dict[str, EmpiricalTable]): Surgery duration tables.
+            los (Dict[str, EmpiricalTable]): Length of stay tables.
+            remaining_los (EmpiricalTable): Remaining length of stay table.
+            fingerprint (str, optional): Hash of the source histograms. Defaults to "".
+        """
+        self.iat = iat
+        self.surgery_duration = surgery_duration
+        self.los = los
+        self.remaining_los = remaining_los
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_histograms(
+        cls, iat_dict, theatre_dur_dict, los_dict, remaining_los, fingerprint=""
+    ):
+        """
+        Compiles the parameters from `(frequencies, bin_edges)` histograms.
+
+        Args:
+            iat_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Inter-arrival time histograms.
+            theatre_dur_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Surgery duration histograms.
+            los_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Length of stay histograms.
+            remaining_los (Tuple[np.ndarray, np.ndarray]): Remaining length of stay histogram.
+            fingerprint (str, optional): Hash of the source histograms. Defaults to "".
+
+        Returns:
+            EmpiricalParameters: The compiled parameters.
+        """
+        return cls(
+            iat={k: EmpiricalTable.grouped(iat_dict[k]) for k in PATIENT_TYPE_KEYS},
+            surgery_duration={
+                k: EmpiricalTable.midpoints(theatre_dur_dict[k])
+                for k in PATIENT_TYPE_KEYS
+            },
+            los={k: EmpiricalTable.grouped(los_dict[k]) for k in PATIENT_TYPE_KEYS},
+            remaining_los=EmpiricalTable.grouped(remaining_los),
+            fingerprint=fingerprint,
+        )
+
+    @classmethod
+    def from_directory(cls, data_dir, cache=None):
+        """
+        Loads the parameters from the JSON histograms in a data directory, via a compiled cache file.
+
+        The cache is used if it was compiled from the same JSON files, and (re)written otherwise.
+
+        Args:
+            data_dir (Union[str, Path]): Directory holding the parameter files.
+            cache (Optional[Union[str, Path]]): Path of the compiled `.npz` cache. Defaults to no cache.
+
+        Returns:
+            EmpiricalParameters: The compiled parameters.
+        """
+        data_dir = Path(data_dir)
+
+        sources = {
+            name: (data_dir / fname).read_bytes()
+            for name, fname in PARAMETER_FILES.items()
+        }
+        digest = hashlib.sha256()
+        for source in sources.values():
+            digest.update(hashlib.sha256(source).digest())
+        fingerprint = digest.hexdigest()
+
+        if cache is not None and Path(cache).exists():
+            parameters = cls.load(cache)
+            if parameters.fingerprint == fingerprint:
+                return parameters
+            logger.info("Parameter files have changed, recompiling %s", cache)
+
+        def histograms(source):
+            return {
+                k: (np.array(v[0]), np.array(v[1]))
+                for k, v in json.loads(source).items()
+            }
+
+        remaining_los = json.loads(sources["remaining_los"])
+        parameters = cls.from_histograms(
+            histograms(sources["iat"]),
+            histograms(sources["surgery_duration"]),
+            histograms(sources["los"]),
+            (np.array(remaining_los[0]), np.array(remaining_los[1])),
+            fingerprint=fingerprint,
+        )
+
+        if cache is not None:
+            parameters.save(cache)
+
+        return parameters
+
+    def tables(self):
+        """
+        Lists the compiled tables.
+
+        Returns:
+            Dict[str, EmpiricalTable]: Every table, keyed by `<histogram set>/<patient type>` (or just the set name).
+        """
+        tables = {}
+        for name in ["iat", "surgery_duration", "los"]:
+            for key, table in getattr(self, name).items():
+                tables[f"{name}/{key}"] = table
+        tables["remaining_los"] = self.remaining_los
+        return tables
+
+    def save(self, path):
+        """
+        Saves the compiled tables to an uncompressed `.npz` file.
+
+        Args:
+            path (Union[str, Path]): The file to write.
+        """
+        arrays = {"fingerprint": np.array(self.fingerprint)}
+        for name, table in self.tables().items():
+            arrays[f"{name}/cdf"] = table.cdf
+            arrays[f"{name}/lower"] = table.lower
+            if table.is_grouped:
+                arrays[f"{name}/upper"] = table.upper
+
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fout:
+            np.savez(fout, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads compiled tables saved by `save`.
+
+        Args:
+            path (Union[str, Path]): The `.npz` file.
+
+        Returns:
+            EmpiricalParameters: The compiled parameters.
+        """
+        with np.load(path) as arrays:
+
+            def table(name):
+                upper = f"{name}/upper"
+                return EmpiricalTable(
+                    arrays[f"{name}/cdf"],
+                    arrays[f"{name}/lower"],
+                    arrays[upper] if upper in arrays else None,
+                )
+
+            return cls(
+                iat={k: table(f"iat/{k}") for k in PATIENT_TYPE_KEYS},
+                surgery_duration={
+                    k: table(f"surgery_duration/{k}") for k in PATIENT_TYPE_KEYS
+                },
+                los={k: table(f"los/{k}") for k in PATIENT_TYPE_KEYS},
+                remaining_los=table("remaining_los"),
+                fingerprint=str(arrays["fingerprint"]),
+            )
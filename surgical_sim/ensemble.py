@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from .model import OCCUPANCY_CHANNELS
+
+__all__ = ["EnsembleAggregator", "OccupancyHistogram", "resample_step"]
+
+DEFAULT_PERCENTILES = (2.5, 50, 97.5)
+
+
+def resample_step(times, values, grid):
+    """
+    Samples a step function on a time grid.
+
+    The step function holds each value from its time until the next event (as drawn with
+    `drawstyle='steps-post'`), and is 0 before the first event.
+
+    Args:
+        times (np.ndarray): Sorted event times.
+        values (np.ndarray): The value from each event time onwards.
+        grid (np.ndarray): The times to sample at.
+
+    Returns:
+        np.ndarray: The value of the step function at each grid time.
+    """
+    values = np.asarray(values, dtype=float)
+    idx = np.searchsorted(times, grid, side="right") - 1
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], 0.0)
+
+
+class OccupancyHistogram:
+    """
+    Running per-time histograms of an integer occupancy, over a fixed time grid.
+
+    Each replication's step function is resampled onto the grid and counted into a
+    `(len(grid), levels)` table, so memory depends on the grid and the highest occupancy seen, not
+    on the number of replications. As occupancy is a count, percentiles read from the histograms
+    are exact and match `np.percentile` across the replications.
+
+    Attributes:
+        grid (np.ndarray): The times occupancy is sampled at.
+        counts (np.ndarray): Number of replications at each occupancy level, for each grid time.
+        n (int): Number of replications added.
+    """
+
+    def __init__(self, grid, levels=1):
+        """
+        Initializes empty histograms.
+
+        Args:
+            grid (np.ndarray): The times to sample occupancy at.
+            levels (int, optional): Initial number of occupancy levels (0 to levels - 1). The histograms grow
+                as higher occupancies are seen. Defaults to 1.
+        """
+        self.grid = np.asarray(grid, dtype=float)
+        self.counts = np.zeros((len(self.grid), levels), dtype=np.int64)
+        self.n = 0
+
+    def add(self, times, values):
+        """
+        Adds one replication's occupancy.
+
+        Args:
+            times (np.ndarray): Sorted event times.
+            values (np.ndarray): The occupancy from each event time onwards.
+        """
+        levels = np.rint(resample_step(times, values, self.grid)).astype(np.int64)
+        np.maximum(levels, 0, out=levels)
+
+        top = levels.max(initial=0)
+        if top >= self.counts.shape[1]:
+            self.counts = np.pad(
+                self.counts,
+                (
+                    (0, 0),
+                    (0, max(top + 1, 2 * self.counts.shape[1]) - self.counts.shape[1]),
+                ),
+            )
+
+        self.counts[np.arange(len(self.grid)), levels] += 1
+        self.n += 1
+
+    def __order_statistic(self, k):
+        """
+        The k-th smallest (0-based) occupancy at each grid time.
+        """
+        return (np.cumsum(self.counts, axis=1) > k[:, None]).argmax(axis=1)
+
+    def percentile(self, q):
+        """
+        Computes a percentile of occupancy at each grid time, with `np.percentile`'s default linear
+        interpolation.
+
+        Args:
+            q (float): The percentile, between 0 and 100.
+
+        Returns:
+            np.ndarray: The percentile at each grid time.
+        """
+        if self.n == 0:
+            return np.full(len(self.grid), np.nan)
+
+        position = np.full(len(self.grid), q / 100 * (self.n - 1))
+        lower = np.floor(position)
+        low = self.__order_statistic(lower)
+        high = self.__order_statistic(np.ceil(position))
+
+        return low + (high - low) * (position - lower)
+
+    def mean(self):
+        """
+        Computes the mean occupancy at each grid time.
+
+        Returns:
+            np.ndarray: The mean at each grid time.
+        """
+        return self.counts @ np.arange(self.counts.shape[1]) / max(self.n, 1)
+
+
+class EnsembleAggregator:
+    """
+    Streams the occupancy of replications into fixed-size histograms, to give percentile bands for
+    ward beds, critical care beds and theatres without keeping every replication's curve.
+
+    Example:
+        ensemble = EnsembleAggregator(np.arange(0, 14 * 24, 0.5))
+        run_replications(config, n=1000, ensemble=ensemble)
+        ensemble.bands()["beds"]
+
+    Attributes:
+        grid (np.ndarray): The times occupancy is sampled at.
+        histograms (Dict[str, OccupancyHistogram]): The histograms of each occupancy channel.
+    """
+
+    def __init__(self, grid, channels=tuple(OCCUPANCY_CHANNELS)):
+        """
+        Initializes empty histograms for each channel.
+
+        Args:
+            grid (np.ndarray): The times to sample occupancy at.
+            channels (Iterable[str], optional): The occupancy channels to aggregate. Defaults to beds, CC beds
+                and theatres.
+        """
+        self.grid = np.asarray(grid, dtype=float)
+        self.histograms = {
+            channel: OccupancyHistogram(self.grid) for channel in channels
+        }
+
+    def __len__(self):
+        return min((h.n for h in self.histograms.values()), default=0)
+
+    def add(self, occupancy):
+        """
+        Adds one replication's occupancy step functions.
+
+        Args:
+            occupancy (Dict[str, Tuple[np.ndarray, np.ndarray]]): The event times and occupancy of each channel,
+                as in `replication_result.occupancy`.
+        """
+        for channel, histogram in self.histograms.items():
+            histogram.add(*occupancy[channel])
+
+    def bands(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Computes percentile bands of each channel.
+
+        Args:
+            percentiles (Iterable[float], optional): The percentiles to compute. Defaults to the median and
+                95% band.
+
+        Returns:
+            Dict[str, pd.DataFrame]: For each channel, the percentiles and mean at each grid time, indexed
+                by "Simulation time".
+        """
+        return {
+            channel: pd.DataFrame(
+                {
+                    **{q: histogram.percentile(q) for q in percentiles},
+                    "mean": histogram.mean(),
+                },
+                index=pd.Index(self.grid, name="Simulation time"),
+            )
+            for channel, histogram in self.histograms.items()
+        }
@@ -0,0 +1,202 @@
+import copy
+import dataclasses
+
+import numpy as np
+from sim_tools.distributions import Exponential
+
+from .distributions import BlockSampler, EmpiricalParameters, EmpiricalSampler
+from .patients import BreachTracker, PatientTable
+
+SEED = 42
+
+EMERGENCY_MEAN_IAT = 10
+EMERGENCY_SURGICAL_DURATION = 3
+EMERGENCY_MEAN_RECOVERY_TIME = 60
+
+ELECTIVE_MEAN_IAT = 16
+ELECTIVE_SURGICAL_DURATION = 2
+ELECTIVE_MEAN_RECOVERY_TIME = 48
+
+RUN_LENGTH = 480
+NUM_BEDS = 10
+NUM_CC_BEDS = 2
+
+DAILY = 24
+WEEKLY = 7 * DAILY
+
+INITIAL_NUMBER_OF_ELECTIVE = 3
+INITIAL_NUMBER_OF_EMERGENCY = 1
+
+MAX_EMERGENCY_WAIT = 48
+
+SAMPLE_BLOCK_SIZE = 256
+
+
+class Experiment:
+    def __init__(
+        self,
+        seed=SEED,
+        initial_number_of_elective=INITIAL_NUMBER_OF_ELECTIVE,
+        initial_number_of_emergency=INITIAL_NUMBER_OF_EMERGENCY,
+        elective_mean_iat=ELECTIVE_MEAN_IAT,
+        emergency_mean_iat=EMERGENCY_MEAN_IAT,
+        elective_surgical_duration=ELECTIVE_SURGICAL_DURATION,
+        emergency_surgical_duration=EMERGENCY_SURGICAL_DURATION,
+        elective_mean_recovery_time=ELECTIVE_MEAN_RECOVERY_TIME,
+        emergency_mean_recovery_time=EMERGENCY_MEAN_RECOVERY_TIME,
+        max_emergency_wait=MAX_EMERGENCY_WAIT,
+        sample_block_size=SAMPLE_BLOCK_SIZE,
+    ):
+        self.patients = []
+
+        self.initial_number_of_elective = initial_number_of_elective
+        self.initial_number_of_emergency = initial_number_of_emergency
+
+        seeds = np.random.SeedSequence(seed).spawn(6)
+
+        self.emergency_arrival_dist = BlockSampler(
+            Exponential(emergency_mean_iat, random_seed=seeds[0]),
+            sample_block_size,
+        )
+        self.elective_arrival_dist = BlockSampler(
+            Exponential(elective_mean_iat, random_seed=seeds[1]),
+            sample_block_size,
+        )
+
+        self.elective_surgical_duration_dist = BlockSampler(
+            Exponential(elective_surgical_duration, random_seed=seeds[2]),
+            sample_block_size,
+        )
+        self.emergency_surgical_duration_dist = BlockSampler(
+            Exponential(emergency_surgical_duration, random_seed=seeds[3]),
+            sample_block_size,
+        )
+
+        self.elective_recovery_time_dist = BlockSampler(
+            Exponential(elective_mean_recovery_time, random_seed=seeds[4]),
+            sample_block_size,
+        )
+        self.emergency_recovery_time_dist = BlockSampler(
+            Exponential(emergency_mean_recovery_time, random_seed=seeds[5]),
+            sample_block_size,
+        )
+
+        self.max_emergency_wait = max_emergency_wait
+        self.breach_tracker = BreachTracker(max_emergency_wait)
+
+    def patient_table(self):
+        """
+        Exports the experiment's patients as columns for vectorised analysis.
+
+        Returns:
+            PatientTable: The patients as numpy arrays.
+        """
+        return PatientTable(self.patients)
+
+
+class EmpiricalExperiment:
+    """
+    Experiment parameterised by the empirical histograms in `data/`, for emergency, elective and day case patients.
+
+    Inter-arrival times, lengths of stay and the remaining length of stay of patients already on the ward
+    are sampled from grouped continuous histograms; surgery durations are sampled from the midpoints of
+    the non-empty surgery duration bins. The histograms are compiled once into `EmpiricalParameters`,
+    which replications share read-only; each replication only creates its own random streams.
+    """
+
+    def __init__(
+        self,
+        parameters,
+        seed=SEED,
+        initial_number_of_elective=INITIAL_NUMBER_OF_ELECTIVE,
+        initial_number_of_emergency=INITIAL_NUMBER_OF_EMERGENCY,
+        max_emergency_wait=MAX_EMERGENCY_WAIT,
+        sample_block_size=SAMPLE_BLOCK_SIZE,
+    ):
+        self.patients = []
+
+        self.initial_number_of_elective = initial_number_of_elective
+        self.initial_number_of_emergency = initial_number_of_emergency
+
+        seeds = np.random.SeedSequence(seed).spawn(10)
+
+        def sampler(table, seed):
+            return BlockSampler(EmpiricalSampler(table, seed), sample_block_size)
+
+        self.emergency_arrival_dist = sampler(parameters.iat["EMERG"], seeds[0])
+        self.elective_arrival_dist = sampler(parameters.iat["ELECT"], seeds[1])
+        self.dcase_arrival_dist = sampler(parameters.iat["DCASE"], seeds[2])
+
+        self.emergency_surgical_duration_dist = sampler(
+            parameters.surgery_duration["EMERG"], seeds[3]
+        )
+        self.elective_surgical_duration_dist = sampler(
+            parameters.surgery_duration["ELECT"], seeds[4]
+        )
+        self.dcase_surgical_duration_dist = sampler(
+            parameters.surgery_duration["DCASE"], seeds[5]
+        )
+
+        self.emergency_recovery_time_dist = sampler(parameters.los["EMERG"], seeds[6])
+        self.elective_recovery_time_dist = sampler(parameters.los["ELECT"], seeds[7])
+        self.dcase_recovery_time_dist = sampler(parameters.los["DCASE"], seeds[8])
+
+        self.remaining_los_dist = sampler(parameters.remaining_los, seeds[9])
+
+        self.max_emergency_wait = max_emergency_wait
+        self.breach_tracker = BreachTracker(max_emergency_wait)
+
+    @classmethod
+    def from_histograms(
+        cls, iat_dict, theatre_dur_dict, los_dict, remaining_los, **kwargs
+    ):
+        """
+        Creates an experiment from `(frequencies, bin_edges)` histograms keyed by "EMERG", "ELECT" and "DCASE".
+
+        Args:
+            iat_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Inter-arrival time histograms.
+            theatre_dur_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Surgery duration histograms.
+            los_dict (Dict[str, Tuple[np.ndarray, np.ndarray]]): Length of stay histograms.
+            remaining_los (Tuple[np.ndarray, np.ndarray]): Remaining length of stay histogram.
+            **kwargs: Other arguments of `EmpiricalExperiment`.
+
+        Returns:
+            EmpiricalExperiment: The experiment.
+        """
+        return cls(
+            EmpiricalParameters.from_histograms(
+                iat_dict, theatre_dur_dict, los_dict, remaining_los
+            ),
+            **kwargs,
+        )
+
+    def copy(self):
+        """
+        Copies the experiment part way through a run: its patients, breach tracker and random streams.
+
+        The copy shares the compiled distribution tables, and otherwise continues independently.
+
+        Returns:
+            EmpiricalExperiment: The copy.
+        """
+        experiment = copy.copy(self)
+        experiment.patients = [
+            dataclasses.replace(p, cancellations=list(p.cancellations))
+            for p in self.patients
+        ]
+        experiment.breach_tracker = self.breach_tracker.copy(
+            {p.id: p for p in experiment.patients}
+        )
+        for name, value in vars(self).items():
+            if isinstance(value, BlockSampler):
+                setattr(experiment, name, value.copy())
+        return experiment
+
+    def patient_table(self):
+        """
+        Exports the experiment's patients as columns for vectorised analysis.
+
+        Returns:
+            PatientTable: The patients as numpy arrays.
+        """
+        return PatientTable(self.patients)
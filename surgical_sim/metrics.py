@@ -0,0 +1,250 @@
+from array import array
+
+import numpy as np
+
+from .patients import PatientType
+
+__all__ = ["MetricsChannel", "MetricsRecorder", "RunSummary"]
+
+# The counters kept by `RunSummary` for each patient type
+SUMMARY_COUNTERS = [
+    "patients_seen",
+    "patients_cancelled",
+    "surgery",
+    "cancellations",
+    "wait",
+    "breaches",
+    "discharged",
+]
+
+
+class MetricsChannel:
+    """
+    A growable, typed record of `(time, value)` events for one metric.
+
+    Events are stored in two `array("d")` buffers rather than as a list of tuples, which keeps the
+    channel compact in memory and cheap to pickle back from worker processes. The channel keeps the
+    `append`/`sort`/iteration interface of the lists it replaces.
+
+    Attributes:
+        times (array.array): Event times.
+        values (array.array): Event values.
+        base (float): Total value of the events retired from the channel, which `cumulative` starts from.
+    """
+
+    __slots__ = ("times", "values", "base")
+
+    def __init__(self, events=()):
+        """
+        Initializes the channel, optionally from existing events.
+
+        Args:
+            events (Iterable[Tuple[float, float]], optional): Initial `(time, value)` events.
+        """
+        self.times = array("d")
+        self.values = array("d")
+        self.base = 0.0
+        for event in events:
+            self.append(event)
+
+    def append(self, event):
+        """
+        Records an event.
+
+        Args:
+            event (Tuple[float, float]): The `(time, value)` pair to record.
+        """
+        time, value = event
+        self.times.append(time)
+        self.values.append(value)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times, self.values)
+
+    def __getitem__(self, i):
+        return self.times[i], self.values[i]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_array().astype(dtype or float, copy=False)
+
+    def sort(self, key=None, reverse=False):
+        """
+        Sorts the events in place, with the same semantics as `list.sort`.
+
+        Args:
+            key (Callable, optional): Key applied to each `(time, value)` pair. Defaults to the pair itself.
+            reverse (bool, optional): Sort in descending order. Defaults to False.
+        """
+        events = sorted(self, key=key, reverse=reverse)
+        self.times = array("d", (time for time, _ in events))
+        self.values = array("d", (value for _, value in events))
+
+    def to_array(self):
+        """
+        Converts the channel into a numpy array.
+
+        Returns:
+            np.ndarray: An `(n, 2)` array of event times and values.
+        """
+        return np.column_stack(
+            [
+                np.frombuffer(self.times, dtype=float),
+                np.frombuffer(self.values, dtype=float),
+            ]
+        )
+
+    def retire(self, before):
+        """
+        Removes the events before a time, adding their values to `base`.
+
+        Args:
+            before (float): The time events are kept from.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The times and values of the removed events.
+        """
+        times = np.frombuffer(self.times, dtype=float)
+        values = np.frombuffer(self.values, dtype=float)
+        keep = times >= before
+
+        retired = times[~keep].copy(), values[~keep].copy()
+        self.base += retired[1].sum()
+        self.times = array("d", times[keep].tobytes())
+        self.values = array("d", values[keep].tobytes())
+        return retired
+
+    def cumulative(self):
+        """
+        Builds the step function given by the running total of the event values.
+
+        Events are ordered by time then value, as the notebooks did after a run, and only the last
+        total at each distinct time is kept. Totals start from `base`, so after `retire` the step
+        function is unchanged from the earliest event kept.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distinct event times and the running total at each.
+        """
+        times = np.frombuffer(self.times, dtype=float)
+        values = np.frombuffer(self.values, dtype=float)
+
+        order = np.lexsort((values, times))
+        times = times[order]
+        totals = self.base + values[order].cumsum()
+
+        last = np.append(times[1:] != times[:-1], True)[: len(times)]
+        return times[last], totals[last]
+
+
+class RunSummary:
+    """
+    Per patient type counters of a run, updated as surgeries, cancellations and discharges happen.
+
+    The counters give the same summary as tabulating the patients after the run, without keeping
+    or sending back the patients.
+
+    Attributes:
+        counts (Dict[PatientType, Dict[str, float]]): The value of each of `SUMMARY_COUNTERS`, for each
+            patient type: patients operated on, patients cancelled at least once, hours of surgery,
+            cancellations, hours waited for surgery by the patients operated on, emergency patients
+            operated on after waiting longer than the maximum emergency wait, and patients discharged.
+    """
+
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = {
+            patient_type: dict.fromkeys(SUMMARY_COUNTERS, 0)
+            for patient_type in PatientType
+        }
+
+    def surgery(self, patient, time, max_wait=None):
+        """
+        Counts a patient's surgery.
+
+        Args:
+            patient (Patient): The patient, with their arrival time and surgery duration.
+            time (float): The time surgery starts.
+            max_wait (Optional[float]): The maximum emergency wait. Defaults to not counting breaches.
+        """
+        counts = self.counts[patient.patient_type]
+        wait = time - patient.arrival_time
+
+        counts["patients_seen"] += 1
+        counts["surgery"] += patient.surgery_duration
+        counts["wait"] += wait
+        if (
+            max_wait is not None
+            and patient.patient_type == PatientType.EMERGENCY
+            and wait > max_wait
+        ):
+            counts["breaches"] += 1
+
+    def cancellation(self, patient):
+        """
+        Counts a cancellation, once it has been added to the patient's cancellations.
+
+        Args:
+            patient (Patient): The cancelled patient.
+        """
+        counts = self.counts[patient.patient_type]
+        counts["cancellations"] += 1
+        if len(patient.cancellations) == 1:
+            counts["patients_cancelled"] += 1
+
+    def discharge(self, patient):
+        """
+        Counts a patient's discharge from the ward.
+
+        Args:
+            patient (Patient): The discharged patient.
+        """
+        self.counts[patient.patient_type]["discharged"] += 1
+
+    def record(self):
+        """
+        Flattens the counters into a summary record.
+
+        Returns:
+            Dict[str, float]: The counters, keyed like `"emergency_patients_seen"`.
+        """
+        return {
+            f"{patient_type.value.lower()}_{counter}": counts[counter]
+            for counter in SUMMARY_COUNTERS
+            for patient_type, counts in self.counts.items()
+        }
+
+
+class MetricsRecorder(dict):
+    """
+    A dictionary of metrics channels, created on first use.
+
+    Drop-in replacement for the `defaultdict(lambda: [])` previously used to collect metrics: any key
+    that is read before being set becomes an empty `MetricsChannel`, and other values (e.g. the
+    patient list) can still be stored against arbitrary keys.
+
+    Attributes:
+        summary (RunSummary): Per patient type counters, updated as the run goes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.summary = RunSummary()
+
+    def __missing__(self, key):
+        channel = self[key] = MetricsChannel()
+        return channel
+
+    def occupancy(self, key):
+        """
+        Builds the occupancy step function for a channel of +1/-1 events.
+
+        Args:
+            key (str): The channel name, e.g. `"bed_event"` or `"surgical_event"`.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distinct event times and the occupancy at each.
+        """
+        return self[key].cumulative()
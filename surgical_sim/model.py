@@ -0,0 +1,431 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import simpy
+
+from .distributions import PATIENT_TYPE_KEYS, EmpiricalParameters
+from .experiment import MAX_EMERGENCY_WAIT, SEED, EmpiricalExperiment
+from .metrics import SUMMARY_COUNTERS, MetricsRecorder
+from .patients import PatientGenerator, PatientType
+from .processing import daily_planning, scheduler
+from .profiling import ProfiledEnvironment, ProfiledSchedule
+from .resources import WardResource, initialise_ward_random
+from .schedule import Schedule
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+PARAMETER_CACHE = "parameters.npz"
+
+SUMMARY_METRICS = [
+    f"{patient_type}_{metric}"
+    for metric in SUMMARY_COUNTERS
+    for patient_type in ["emergency", "elective", "daycase"]
+]
+
+OCCUPANCY_CHANNELS = {
+    "beds": "bed_event",
+    "cc_beds": "cc_bed_event",
+    "theatres": "surgical_event",
+}
+
+
+@dataclass
+class ModelInputs:
+    """
+    The read-only data a replication is built from.
+
+    Attributes:
+        parameters (EmpiricalParameters): The inter-arrival time, surgery duration and length of stay
+            histograms, compiled into sampling tables.
+        theatre_schedule (pd.DataFrame): Theatre slots, with `hour`, `patient_type` and `hours_total` columns.
+        wait_list (pd.DataFrame): Elective and day case waiting list, with `hours_waited` and `em_el_dc` columns.
+        emergency_wait_list (pd.DataFrame): Emergency waiting list, with an `hours_waited` column.
+        initial_occupancy (int): Number of ward beds occupied at the start.
+    """
+
+    parameters: EmpiricalParameters
+    theatre_schedule: pd.DataFrame
+    wait_list: pd.DataFrame
+    emergency_wait_list: pd.DataFrame
+    initial_occupancy: int
+
+    @classmethod
+    def from_directory(
+        cls,
+        data_dir=DATA_DIR,
+        num_initial_emergencies=52,
+        seed=SEED,
+        cache=PARAMETER_CACHE,
+    ):
+        """
+        Loads the model inputs from the files in a data directory, as the notebooks do.
+
+        The emergency waiting list is not stored, so it is drawn uniformly from 0-48 hours waited.
+        The JSON histograms are compiled once and cached, and later loads read the compiled cache.
+
+        Args:
+            data_dir (Union[str, Path], optional): Directory holding the data files. Defaults to the repository's `data/`.
+            num_initial_emergencies (int, optional): Number of emergency patients waiting at the start. Defaults to 52.
+            seed (int, optional): Seed for the emergency waiting list. Defaults to SEED.
+            cache (Optional[str]): File name, within `data_dir`, of the compiled parameter cache. None disables
+                the cache. Defaults to "parameters.npz".
+
+        Returns:
+            ModelInputs: The loaded inputs.
+        """
+        data_dir = Path(data_dir)
+
+        emergency_wait_list = pd.DataFrame(
+            np.random.default_rng(seed).integers(0, 48, size=num_initial_emergencies),
+            columns=["hours_waited"],
+        ).sort_values(by="hours_waited", ascending=False)
+
+        return cls(
+            parameters=EmpiricalParameters.from_directory(
+                data_dir, cache=data_dir / cache if cache is not None else None
+            ),
+            theatre_schedule=pd.read_csv(data_dir / "theatre_schedule.csv")[
+                ["hour", "patient_type", "hours_total"]
+            ],
+            wait_list=pd.read_csv(data_dir / "wait_list.csv"),
+            emergency_wait_list=emergency_wait_list,
+            initial_occupancy=len(pd.read_csv(data_dir / "initial_occupancy.csv")),
+        )
+
+
+@dataclass(frozen=True)
+class RunConfig:
+    """
+    Scenario parameters for a replication.
+
+    Attributes:
+        seed (int): Seed for the `SeedSequence` replication seeds are spawned from.
+        num_beds (int): Number of ward beds.
+        num_cc_beds (int): Number of critical care beds.
+        max_emergency_wait (float): Maximum time an emergency patient should wait for surgery.
+        run_length (float): Length of each replication in hours.
+        additional_capacity_days (int): Number of days, from the first, given an extra emergency session.
+        additional_capacity_hour (float): Start hour of each extra emergency session within its day.
+        additional_capacity_hours (float): Length of each extra emergency session.
+        bed_aware_planning (bool): Whether daily planning moves patients the ward is not forecast to
+            have beds for to later days.
+    """
+
+    seed: int = SEED
+    num_beds: int = 100
+    num_cc_beds: int = 16
+    max_emergency_wait: float = MAX_EMERGENCY_WAIT
+    run_length: float = 14 * 24
+    additional_capacity_days: int = 0
+    additional_capacity_hour: float = 9
+    additional_capacity_hours: float = 5
+    bed_aware_planning: bool = False
+
+
+def theatre_slots(inputs, config):
+    """
+    Builds the theatre slot table for a scenario, adding any extra emergency sessions.
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+        config (RunConfig): The scenario parameters.
+
+    Returns:
+        pd.DataFrame: Theatre slots sorted by hour, with `hour`, `patient_type` and `hours_total` columns.
+    """
+    if config.additional_capacity_days == 0:
+        return inputs.theatre_schedule.sort_values(
+            by="hour", kind="stable"
+        ).reset_index(drop=True)
+
+    additional_capacity = pd.DataFrame(
+        [
+            (
+                config.additional_capacity_hour + day * 24,
+                PatientType.EMERGENCY.value,
+                config.additional_capacity_hours,
+            )
+            for day in range(config.additional_capacity_days)
+        ],
+        columns=["hour", "patient_type", "hours_total"],
+    )
+
+    return (
+        pd.concat([inputs.theatre_schedule, additional_capacity])
+        .sort_values(by="hour", kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def schedule_layout(config):
+    """
+    Picks out the scenario parameters that change the theatre schedule.
+
+    Args:
+        config (RunConfig): The scenario parameters.
+
+    Returns:
+        Tuple[int, float, float]: The additional capacity days, start hour and length.
+    """
+    return (
+        config.additional_capacity_days,
+        config.additional_capacity_hour,
+        config.additional_capacity_hours,
+    )
+
+
+def build_schedule(slot_table):
+    """
+    Builds an empty schedule from a slot table.
+
+    Args:
+        slot_table (pd.DataFrame): Theatre slots, with `hour`, `patient_type` and `hours_total` columns.
+
+    Returns:
+        Schedule: A schedule with no patients booked, repeating the slot table.
+    """
+    return Schedule.from_table(slot_table[["hour", "patient_type", "hours_total"]])
+
+
+def summarise(experiment):
+    """
+    Computes the per-type summary of a finished run from its patients.
+
+    This gives the same values as the `RunSummary` counters kept during the run, e.g. to check them
+    or to summarise runs made without a `MetricsRecorder`.
+
+    Args:
+        experiment (Any): The experiment, with its list of patients and maximum emergency wait.
+
+    Returns:
+        Dict[str, float]: The values of `SUMMARY_METRICS`.
+    """
+    table = experiment.patient_table()
+    seen = ~np.isnan(table.surgical_times)
+    cancelled = table.cancellations > 0
+    waits = table.surgical_times - table.arrival_times
+
+    summary = {}
+    for patient_type in PatientType:
+        name = patient_type.value.lower()
+        of_type = table.of_type(patient_type)
+
+        summary[f"{name}_patients_seen"] = np.count_nonzero(of_type & seen)
+        summary[f"{name}_patients_cancelled"] = np.count_nonzero(of_type & cancelled)
+        summary[f"{name}_surgery"] = table.surgery_durations[of_type & seen].sum()
+        summary[f"{name}_cancellations"] = table.cancellations[of_type].sum()
+        summary[f"{name}_wait"] = waits[of_type & seen].sum()
+        summary[f"{name}_breaches"] = (
+            np.count_nonzero(of_type & seen & (waits > experiment.max_emergency_wait))
+            if patient_type == PatientType.EMERGENCY
+            else 0
+        )
+        summary[f"{name}_discharged"] = np.count_nonzero(
+            of_type & ~np.isnan(table.discharge_times)
+        )
+
+    return {metric: summary[metric] for metric in SUMMARY_METRICS}
+
+
+def patient_generators(experiment):
+    """
+    Creates the emergency, elective and day case patient generators of an experiment.
+
+    Args:
+        experiment (EmpiricalExperiment): The experiment, with the distributions of each patient type.
+
+    Returns:
+        Dict[PatientType, PatientGenerator]: The generator of each patient type.
+    """
+    return {
+        PatientType.EMERGENCY: PatientGenerator(
+            experiment.emergency_arrival_dist,
+            experiment.emergency_surgical_duration_dist,
+            experiment.emergency_recovery_time_dist,
+            "Emergency",
+        ),
+        PatientType.ELECTIVE: PatientGenerator(
+            experiment.elective_arrival_dist,
+            experiment.elective_surgical_duration_dist,
+            experiment.elective_recovery_time_dist,
+            "Elective",
+        ),
+        PatientType.DAYCASE: PatientGenerator(
+            experiment.dcase_arrival_dist,
+            experiment.dcase_surgical_duration_dist,
+            experiment.dcase_recovery_time_dist,
+            "Daycase",
+        ),
+    }
+
+
+def waiting_lists(inputs):
+    """
+    Splits the waiting lists of the model inputs by patient type.
+
+    Args:
+        inputs (ModelInputs): The model inputs, with the waiting lists.
+
+    Returns:
+        Dict[PatientType, pd.DataFrame]: The waiting list of each patient type, in the order they are
+            booked at the start of a run.
+    """
+    wait_list = inputs.wait_list
+    return {
+        PatientType.ELECTIVE: wait_list[wait_list["em_el_dc"] == "Inpatient"],
+        PatientType.DAYCASE: wait_list[wait_list["em_el_dc"] == "DCASE"],
+        PatientType.EMERGENCY: inputs.emergency_wait_list,
+    }
+
+
+def referral_times(inputs, horizon, n, rng):
+    """
+    Draws the referral times of each patient type for many replications at once, for the
+    vectorised engines.
+
+    Each replication has the waiting list, then enough new referrals drawn from the inter-arrival
+    time table to run past the horizon.
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+        horizon (float): The time referrals must cover.
+        n (int): Number of replications.
+        rng (np.random.Generator): The random stream to draw from.
+
+    Returns:
+        Dict[PatientType, Tuple[np.ndarray, np.ndarray]]: For each patient type, the sorted arrival
+            times of the waiting list, shared by every replication, and the `(n, m)` sorted arrival
+            times of new referrals.
+    """
+    referrals = {}
+    for patient_type, wait_list in waiting_lists(inputs).items():
+        key = PATIENT_TYPE_KEYS[list(PatientType).index(patient_type)]
+        iat_table = inputs.parameters.iat[key]
+
+        mean_iat = max(iat_table.sample(rng, 1000).mean(), 1e-9)
+        referrals[patient_type] = (
+            np.sort(-wait_list["hours_waited"].to_numpy(dtype=float)),
+            np.cumsum(
+                iat_table.sample(rng, (n, int(2 * horizon / mean_iat) + 10)), axis=1
+            ),
+        )
+    return referrals
+
+
+def book_waiting_lists(env, inputs, experiment, schedule, generators):
+    """
+    Generates the patients on the waiting lists at the start of a run and books them into the schedule.
+
+    Args:
+        env (simpy.Environment): The simulation environment.
+        inputs (ModelInputs): The model inputs, with the waiting lists.
+        experiment (EmpiricalExperiment): The experiment.
+        schedule (Schedule): The schedule to book patients into.
+        generators (Dict[PatientType, PatientGenerator]): The generator of each patient type.
+    """
+    for patient_type, wait_list in waiting_lists(inputs).items():
+        generators[patient_type].initial_generate_patient(
+            env, experiment, schedule, wait_list
+        )
+
+
+def start_processes(
+    env,
+    beds,
+    cc_beds,
+    experiment,
+    schedule,
+    generators,
+    metrics,
+    bed_aware_planning=False,
+    stream=None,
+):
+    """
+    Starts the arrival, daily planning and theatre scheduler processes of a run.
+
+    Args:
+        env (simpy.Environment): The simulation environment.
+        beds (WardResource): Ward beds.
+        cc_beds (simpy.Resource): Critical care beds.
+        experiment (EmpiricalExperiment): The experiment.
+        schedule (Schedule): The schedule.
+        generators (Dict[PatientType, PatientGenerator]): The generator of each patient type.
+        metrics (MetricsRecorder): Recorder for simulation metrics.
+        bed_aware_planning (bool, optional): Whether daily planning moves patients the ward is not
+            forecast to have beds for. Defaults to False.
+        stream (Optional[RunStream]): Retires the finished parts of the run each day. Defaults to keeping
+            everything.
+    """
+    for patient_type in [
+        PatientType.EMERGENCY,
+        PatientType.ELECTIVE,
+        PatientType.DAYCASE,
+    ]:
+        env.process(
+            generators[patient_type].generate_patient(env, experiment, schedule)
+        )
+    env.process(
+        daily_planning(
+            env, beds, schedule, experiment, metrics, bed_aware_planning, stream
+        )
+    )
+    env.process(scheduler(env, beds, cc_beds, experiment, schedule, metrics))
+
+
+def single_run(inputs, config, seed, schedule=None, profile=None, stream=None):
+    """
+    Runs one replication of the surgical model.
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+        config (RunConfig): The scenario parameters.
+        seed (int): Seed for this replication's experiment.
+        schedule (Schedule, optional): An empty schedule to use. Defaults to one built from `inputs` and `config`.
+        profile (Optional[RunProfile]): If given, the time spent in each SimPy process and schedule method
+            is added to it. Defaults to no profiling.
+        stream (Optional[RunStream]): If given, the finished parts of the run are retired each day, for long
+            runs. The summary counters are unchanged, but the returned experiment, schedule and metrics only
+            hold what was not retired. Defaults to keeping everything.
+
+    Returns:
+        Tuple[EmpiricalExperiment, Schedule, MetricsRecorder]: The experiment, schedule and metrics after the run.
+    """
+    if schedule is None:
+        schedule = build_schedule(theatre_slots(inputs, config))
+
+    experiment = EmpiricalExperiment(
+        inputs.parameters,
+        seed=seed,
+        max_emergency_wait=config.max_emergency_wait,
+    )
+    generators = patient_generators(experiment)
+
+    metrics = MetricsRecorder()
+    if profile is None:
+        env, run_schedule = simpy.Environment(), schedule
+    else:
+        env = ProfiledEnvironment(profile)
+        run_schedule = ProfiledSchedule(schedule, profile)
+
+    beds = WardResource(env, capacity=config.num_beds)
+    cc_beds = simpy.Resource(env, capacity=config.num_cc_beds)
+
+    initialise_ward_random(env, beds, inputs.initial_occupancy, experiment, metrics)
+    book_waiting_lists(env, inputs, experiment, run_schedule, generators)
+    start_processes(
+        env,
+        beds,
+        cc_beds,
+        experiment,
+        run_schedule,
+        generators,
+        metrics,
+        config.bed_aware_planning,
+        stream,
+    )
+
+    env.run(until=config.run_length)
+
+    return experiment, schedule, metrics
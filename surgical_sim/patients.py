@@ -1,14 +1,49 @@
+import heapq
 import itertools
 import logging
 from dataclasses import dataclass, field
+from enum import Enum
 from typing import List
 
+import numpy as np
+import pandas as pd
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+class PatientType(str, Enum):
+    """
+    The type of a patient, matching the patient types used in the theatre schedule.
+    """
+
+    EMERGENCY = "Emergency"
+    ELECTIVE = "Elective"
+    DAYCASE = "Daycase"
+
+    @classmethod
+    def from_id(cls, patient_id):
+        """
+        Infers a patient type from a patient ID such as "Emergency12".
+
+        Args:
+            patient_id (str): The patient ID.
+
+        Returns:
+            Optional[PatientType]: The first patient type named in the ID, or None if there is none.
+        """
+        return next(
+            (patient_type for patient_type in cls if patient_type.value in patient_id),
+            None,
+        )
+
+
+@dataclass(eq=False, slots=True)
 class Patient:
     """
     Represents a patient in the simulation with relevant surgical and recovery attributes.
 
+    Patients use `__slots__` rather than a per-instance `__dict__`, and compare by identity.
+
     Attributes:
         id (str): Unique identifier for the patient.
         arrival_time (Optional[int]): Time the patient arrives in the simulation.
@@ -17,6 +52,7 @@ class Patient:
         surgery_duration (Optional[int]): Duration of the surgery.
         recovery_time (Optional[int]): Duration of the recovery period.
         cancellations (List[int]): List of times the patient was cancelled.
+        patient_type (Optional[PatientType]): The type of patient. Inferred from `id` if not given.
     """
 
     id: str
@@ -26,6 +62,210 @@ class Patient:
     surgery_duration: int = None
     recovery_time: int = None
     cancellations: List = field(default_factory=lambda: [])
+    patient_type: PatientType = None
+
+    def __post_init__(self):
+        if self.patient_type is None:
+            self.patient_type = PatientType.from_id(self.id)
+
+
+class PatientTable:
+    """
+    A columnar view of a list of patients, for vectorised analysis after a run.
+
+    Times that have not happened (e.g. the surgical time of a patient still waiting) are NaN.
+
+    Attributes:
+        ids (np.ndarray): Patient IDs.
+        patient_types (np.ndarray): Index of each patient's type in `PatientType`, or -1 if unknown.
+        arrival_times (np.ndarray): Arrival times.
+        surgical_times (np.ndarray): Surgery start times.
+        discharge_times (np.ndarray): Discharge times.
+        surgery_durations (np.ndarray): Surgery durations.
+        recovery_times (np.ndarray): Recovery durations.
+        cancellations (np.ndarray): Number of times each patient was cancelled.
+    """
+
+    def __init__(self, patients):
+        """
+        Builds the table from patient objects.
+
+        Args:
+            patients (List[Patient]): The patients to tabulate.
+        """
+        types = list(PatientType)
+
+        def column(attribute):
+            return np.array([getattr(p, attribute) for p in patients], dtype=float)
+
+        self.ids = np.array([p.id for p in patients], dtype=object)
+        self.patient_types = np.array(
+            [
+                types.index(p.patient_type) if p.patient_type in types else -1
+                for p in patients
+            ],
+            dtype=np.int8,
+        )
+        self.arrival_times = column("arrival_time")
+        self.surgical_times = column("surgical_time")
+        self.discharge_times = column("discharge_time")
+        self.surgery_durations = column("surgery_duration")
+        self.recovery_times = column("recovery_time")
+        self.cancellations = np.array(
+            [len(p.cancellations) for p in patients], dtype=np.int32
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def of_type(self, patient_type):
+        """
+        Selects the patients of one type.
+
+        Args:
+            patient_type (PatientType): The patient type to select.
+
+        Returns:
+            np.ndarray: A boolean mask over the table's rows.
+        """
+        return self.patient_types == list(PatientType).index(PatientType(patient_type))
+
+    def to_frame(self):
+        """
+        Converts the table into a DataFrame.
+
+        Returns:
+            pd.DataFrame: One row per patient.
+        """
+        return pd.DataFrame(
+            {
+                "id": self.ids,
+                "patient_type": [
+                    list(PatientType)[code].value if code >= 0 else None
+                    for code in self.patient_types
+                ],
+                "arrival_time": self.arrival_times,
+                "surgical_time": self.surgical_times,
+                "discharge_time": self.discharge_times,
+                "surgery_duration": self.surgery_durations,
+                "recovery_time": self.recovery_times,
+                "cancellations": self.cancellations,
+            }
+        )
+
+
+class BreachTracker:
+    """
+    Tracks unoperated emergency patients in order of their breach deadline.
+
+    Patients are pushed when they arrive and discarded when they are operated on, so finding the
+    patients that breach before a given time only touches those patients rather than every patient
+    in the experiment.
+
+    Attributes:
+        max_wait (float): Maximum time an emergency patient should wait for surgery.
+    """
+
+    def __init__(self, max_wait):
+        """
+        Initializes an empty tracker.
+
+        Args:
+            max_wait (float): Maximum time an emergency patient should wait for surgery.
+        """
+        self.max_wait = max_wait
+
+        self.__deadlines = []
+        self.__breached = {}
+        self.__waiting = set()
+        self.__counter = itertools.count()
+
+    def __len__(self):
+        return len(self.__waiting)
+
+    def push(self, patient):
+        """
+        Starts tracking a patient, with a deadline of their arrival time plus the maximum wait.
+
+        Args:
+            patient (Patient): The emergency patient awaiting surgery.
+        """
+        heapq.heappush(
+            self.__deadlines,
+            (patient.arrival_time + self.max_wait, next(self.__counter), patient),
+        )
+        self.__waiting.add(patient.id)
+
+    def discard(self, patient):
+        """
+        Stops tracking a patient, e.g. once they have been operated on.
+
+        Args:
+            patient (Patient): The patient to stop tracking.
+        """
+        self.__waiting.discard(patient.id)
+        self.__breached.pop(patient.id, None)
+
+    def copy(self, patients):
+        """
+        Copies the tracker, tracking copies of its patients.
+
+        Args:
+            patients (Dict[str, Patient]): The copied patients, keyed by patient ID.
+
+        Returns:
+            BreachTracker: The copy.
+        """
+        tracker = BreachTracker(self.max_wait)
+        tracker.__deadlines = [
+            (deadline, count, patients[patient.id])
+            for deadline, count, patient in self.__deadlines
+        ]
+        tracker.__breached = {
+            patient_id: patients[patient_id] for patient_id in self.__breached
+        }
+        tracker.__waiting = set(self.__waiting)
+        # Tie-breaks only need to follow the deadlines still queued
+        tracker.__counter = itertools.count(
+            max((count for _, count, _ in self.__deadlines), default=-1) + 1
+        )
+        return tracker
+
+    def set_max_wait(self, max_wait):
+        """
+        Changes the maximum wait, moving the deadline of every patient not yet found breaching.
+
+        Deadlines all move by the same amount, so their order, and hence the heap, is unchanged.
+
+        Args:
+            max_wait (float): The new maximum time an emergency patient should wait for surgery.
+        """
+        self.__deadlines = [
+            (patient.arrival_time + max_wait, count, patient)
+            for _, count, patient in self.__deadlines
+        ]
+        self.max_wait = max_wait
+
+    def breaching(self, time):
+        """
+        Finds the tracked patients whose deadline falls before a given time.
+
+        Args:
+            time (float): The time to check deadlines against.
+
+        Returns:
+            List[Patient]: Unoperated patients breaching before `time`, in deadline order.
+        """
+        while self.__deadlines and self.__deadlines[0][0] < time:
+            _, _, patient = heapq.heappop(self.__deadlines)
+            if patient.id in self.__waiting:
+                self.__breached[patient.id] = patient
+
+        return [
+            patient
+            for patient in self.__breached.values()
+            if patient.surgical_time is None
+        ]
 
 
 def emergency_generator(env, experiment, schedule, prefix="Emergency"):
@@ -34,7 +274,8 @@ def emergency_generator(env, experiment, schedule, prefix="Emergency"):
 
     Args:
         env (simpy.Environment): The simulation environment.
-        experiment (Any): Object containing emergency distribution samplers and patient list.
+        experiment (Any): Object containing emergency distribution samplers and patient list, and
+            optionally a `breach_tracker` to track the new patients in.
         schedule (Any): Schedule object used to assign patients to slots.
         prefix (str, optional): Prefix for patient IDs. Defaults to "Emergency".
 
@@ -51,10 +292,13 @@ def emergency_generator(env, experiment, schedule, prefix="Emergency"):
             arrival_time=env.now,
             surgery_duration=experiment.emergency_surgical_duration_dist.sample(),
             recovery_time=experiment.emergency_recovery_time_dist.sample(),
+            patient_type=PatientType.EMERGENCY,
         )
         experiment.patients.append(p)
+        if hasattr(experiment, "breach_tracker"):
+            experiment.breach_tracker.push(p)
 
-        logging.info(f"{env.now:.2f}: {p.id} referral arrives.")
+        logger.info("%.2f: %s referral arrives.", env.now, p.id)
 
         schedule.schedule_patients([p], env.now)
 
@@ -82,10 +326,11 @@ def elective_generator(env, experiment, schedule, prefix="Elective"):
             arrival_time=env.now,
             surgery_duration=experiment.elective_surgical_duration_dist.sample(),
             recovery_time=experiment.elective_recovery_time_dist.sample(),
+            patient_type=PatientType.ELECTIVE,
         )
         experiment.patients.append(p)
 
-        logging.info(f"{env.now:.2f}: {p.id} referral arrives.")
+        logger.info("%.2f: %s referral arrives.", env.now, p.id)
 
         schedule.schedule_patients([p], env.now)
 
@@ -100,18 +345,26 @@ def initial_elective_generator(env, experiment, schedule, prefix="Elective"):
         schedule (Any): Schedule object used to assign patients to slots.
         prefix (str, optional): Prefix for patient IDs. Defaults to "Elective".
     """
-    for patient_count in range(-experiment.initial_number_of_elective, 0):
-        p = Patient(
+    n = experiment.initial_number_of_elective
+    patients = [
+        Patient(
             f"{prefix}{patient_count}",
             arrival_time=env.now,
-            surgery_duration=experiment.elective_surgical_duration_dist.sample(),
-            recovery_time=experiment.elective_recovery_time_dist.sample(),
+            surgery_duration=surgery_duration,
+            recovery_time=recovery_time,
+            patient_type=PatientType.ELECTIVE,
         )
-        experiment.patients.append(p)
+        for patient_count, surgery_duration, recovery_time in zip(
+            range(-n, 0),
+            experiment.elective_surgical_duration_dist.sample(n).tolist(),
+            experiment.elective_recovery_time_dist.sample(n).tolist(),
+        )
+    ]
+    experiment.patients.extend(patients)
 
-        logging.info(f"{env.now:.2f}: {p.id} referral arrives.")
+    logger.info("%.2f: %s elective referrals arrive.", env.now, len(patients))
 
-        schedule.schedule_patients([p], env.now)
+    schedule.book_patients(patients, env.now)
 
 
 def initial_emergency_generator(env, experiment, schedule, prefix="Emergency"):
@@ -120,19 +373,186 @@ def initial_emergency_generator(env, experiment, schedule, prefix="Emergency"):
 
     Args:
         env (simpy.Environment): The simulation environment.
-        experiment (Any): Object containing emergency distribution samplers and patient list.
+        experiment (Any): Object containing emergency distribution samplers and patient list, and
+            optionally a `breach_tracker` to track the new patients in.
         schedule (Any): Schedule object used to assign patients to slots.
         prefix (str, optional): Prefix for patient IDs. Defaults to "Emergency".
     """
-    for patient_count in range(-experiment.initial_number_of_emergency, 0):
-        p = Patient(
+    n = experiment.initial_number_of_emergency
+    patients = [
+        Patient(
             f"{prefix}{patient_count}",
             arrival_time=env.now,
-            surgery_duration=experiment.emergency_surgical_duration_dist.sample(),
-            recovery_time=experiment.emergency_recovery_time_dist.sample(),
+            surgery_duration=surgery_duration,
+            recovery_time=recovery_time,
+            patient_type=PatientType.EMERGENCY,
+        )
+        for patient_count, surgery_duration, recovery_time in zip(
+            range(-n, 0),
+            experiment.emergency_surgical_duration_dist.sample(n).tolist(),
+            experiment.emergency_recovery_time_dist.sample(n).tolist(),
+        )
+    ]
+    experiment.patients.extend(patients)
+    if hasattr(experiment, "breach_tracker"):
+        for p in patients:
+            experiment.breach_tracker.push(p)
+
+    logger.info("%.2f: %s emergency referrals arrive.", env.now, len(patients))
+
+    schedule.book_patients(patients, env.now)
+
+
+class PatientGenerator:
+    """
+    Generates patients of one type from arrival, surgical duration and recovery time distributions.
+
+    Attributes:
+        arrival_dist (Any): Inter-arrival time sampler.
+        surgical_duration_dist (Any): Surgery duration sampler.
+        recovery_time_dist (Any): Recovery time sampler.
+        prefix (str): Prefix for patient IDs, e.g. "Emergency".
+        patient_type (Optional[PatientType]): The type of patient generated, inferred from `prefix` if not given.
+    """
+
+    def __init__(
+        self,
+        arrival_dist,
+        surgical_duration_dist,
+        recovery_time_dist,
+        patient_prefix,
+        patient_type=None,
+    ):
+        """
+        Initializes the generator with its distributions.
+
+        Args:
+            arrival_dist (Any): Inter-arrival time sampler.
+            surgical_duration_dist (Any): Surgery duration sampler.
+            recovery_time_dist (Any): Recovery time sampler.
+            patient_prefix (str): Prefix for patient IDs.
+            patient_type (Optional[PatientType]): The type of patient generated. Defaults to the type named in the prefix.
+        """
+        self.arrival_dist = arrival_dist
+        self.surgical_duration_dist = surgical_duration_dist
+        self.recovery_time_dist = recovery_time_dist
+        self.prefix = patient_prefix
+        self.patient_type = patient_type or PatientType.from_id(patient_prefix)
+
+    def __new_patient(self, patient_id, arrival_time, experiment):
+        """
+        Creates a patient, adds them to the experiment and tracks them if they are an emergency.
+
+        Args:
+            patient_id (str): Unique identifier for the patient.
+            arrival_time (float): Time the patient arrives.
+            experiment (Any): Object containing the patient list and optional breach tracker.
+
+        Returns:
+            Patient: The new patient.
+        """
+        p = Patient(
+            patient_id,
+            arrival_time=arrival_time,
+            surgery_duration=self.surgical_duration_dist.sample(),
+            recovery_time=self.recovery_time_dist.sample(),
+            patient_type=self.patient_type,
         )
         experiment.patients.append(p)
+        if self.patient_type == PatientType.EMERGENCY and hasattr(
+            experiment, "breach_tracker"
+        ):
+            experiment.breach_tracker.push(p)
 
-        logging.info(f"{env.now:.2f}: {p.id} referral arrives.")
+        return p
 
-        schedule.schedule_patients([p], env.now)
+    def __new_patients(self, patient_ids, arrival_times, experiment):
+        """
+        Creates patients in bulk, drawing their surgery durations and recovery times in one
+        vectorised draw each, which gives the same values as creating them one at a time.
+
+        Args:
+            patient_ids (List[str]): Unique identifier of each patient.
+            arrival_times (List[float]): Time each patient arrives.
+            experiment (Any): Object containing the patient list and optional breach tracker.
+
+        Returns:
+            List[Patient]: The new patients.
+        """
+        n = len(patient_ids)
+        patients = [
+            Patient(
+                patient_id,
+                arrival_time=arrival_time,
+                surgery_duration=surgery_duration,
+                recovery_time=recovery_time,
+                patient_type=self.patient_type,
+            )
+            for patient_id, arrival_time, surgery_duration, recovery_time in zip(
+                patient_ids,
+                arrival_times,
+                self.surgical_duration_dist.sample(n).tolist(),
+                self.recovery_time_dist.sample(n).tolist(),
+            )
+        ]
+        experiment.patients.extend(patients)
+        if self.patient_type == PatientType.EMERGENCY and hasattr(
+            experiment, "breach_tracker"
+        ):
+            for p in patients:
+                experiment.breach_tracker.push(p)
+
+        return patients
+
+    def generate_patient(self, env, experiment, schedule):
+        """
+        Continuously generates patients at intervals drawn from the arrival distribution.
+
+        Args:
+            env (simpy.Environment): The simulation environment.
+            experiment (Any): Object containing the patient list.
+            schedule (Any): Schedule object used to assign patients to slots.
+
+        Yields:
+            Generator: SimPy timeout events between patient arrivals.
+        """
+        for patient_count in itertools.count(start=1):
+            inter_arrival_time = self.arrival_dist.sample()
+
+            yield env.timeout(inter_arrival_time)
+
+            p = self.__new_patient(f"{self.prefix}{patient_count}", env.now, experiment)
+
+            logger.info("%.2f: %s referral arrives.", env.now, p.id)
+
+            schedule.schedule_patients([p], env.now)
+
+    def initial_generate_patient(self, env, experiment, schedule, wait_list):
+        """
+        Generates and books the patients already on the waiting list at the start of the simulation.
+
+        The whole list is ingested at once: durations and recovery times are drawn as vectors and
+        the patients are booked with `Schedule.book_patients`, which gives the same slots as
+        booking them one at a time.
+
+        Args:
+            env (simpy.Environment): The simulation environment.
+            experiment (Any): Object containing the patient list.
+            schedule (Any): Schedule object used to assign patients to slots.
+            wait_list (pd.DataFrame): The waiting list, with the time each patient has waited in `hours_waited`.
+        """
+        hours_waited = wait_list["hours_waited"].tolist()
+        patients = self.__new_patients(
+            [f"{self.prefix}{-count}" for count in range(1, len(hours_waited) + 1)],
+            [-hours for hours in hours_waited],
+            experiment,
+        )
+
+        logger.info(
+            "%.2f: %s %s referrals on the waiting list.",
+            env.now,
+            len(patients),
+            self.prefix,
+        )
+
+        schedule.book_patients(patients, env.now)
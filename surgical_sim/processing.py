@@ -1,12 +1,19 @@
-import itertools
 import logging
 
+import numpy as np
+
+from .patients import PatientType
 from .resources import surgery
 
+logger = logging.getLogger(__name__)
+
 
 def scheduler(env, beds, cc_beds, experiment, schedule, metrics):
     """
-    Continuously checks the current simulation time for scheduled surgeries and dispatches them.
+    Dispatches scheduled surgeries at the start of each theatre session.
+
+    The scheduler sleeps until the next distinct session start hour in the schedule, rather than
+    polling every simulation hour, so sessions starting at fractional hours are also dispatched.
 
     Args:
         env (simpy.Environment): The simulation environment.
@@ -14,143 +21,210 @@ def scheduler(env, beds, cc_beds, experiment, schedule, metrics):
         cc_beds (simpy.Resource): Resource representing critical care beds.
         experiment (Any): Object containing experiment configuration and patient data.
         schedule (Any): Schedule object with time-indexed patient assignments.
-        metrics (Dict[str, list]): Dictionary for tracking simulation metrics.
+        metrics (MetricsRecorder): Recorder for simulation metrics.
 
     Yields:
-        simpy.events.Event: A SimPy timeout event that triggers every simulation hour.
+        simpy.events.Event: A SimPy timeout event that triggers at each session start.
     """
-    while True:
-        if len(booked_appts := schedule[env.now]) != 0:
-            for _, scheduled_theatres in booked_appts.iterrows():
-                if len(scheduled_theatres.patients) != 0:
-                    logging.info(
-                        f"Sending {scheduled_theatres.patient_type}: {scheduled_theatres.patients} to surgery."
-                    )
-                    env.process(
-                        surgery(
-                            env,
-                            beds,
-                            cc_beds,
-                            scheduled_theatres.patients,
-                            scheduled_theatres.hours_total,
-                            schedule,
-                            experiment,
-                            metrics,
-                        )
+    for hour in schedule.sessions(env.now):
+        yield env.timeout(hour - env.now)
+
+        slots = schedule.slots_at(hour)
+        for patient_type, hours_total, patients in zip(
+            slots.patient_types, slots.hours_total, slots.patients
+        ):
+            if len(patients) != 0:
+                logger.info("Sending %s: %s to surgery.", patient_type, patients)
+                env.process(
+                    surgery(
+                        env,
+                        beds,
+                        cc_beds,
+                        patients,
+                        hours_total,
+                        schedule,
+                        experiment,
+                        metrics,
                     )
+                )
+
 
-        yield env.timeout(1)
+def defer_for_beds(env, beds, schedule, metrics=None):
+    """
+    Moves the day's last booked elective and day case patients to later days when the ward is not
+    forecast to have a bed for every patient booked today.
 
+    The forecast is the beds free now plus those due to be freed in the next 24 hours, so beds
+    freed and taken again during the day are not counted. Patients are taken from the end of the
+    day's latest slots first, as `Schedule.pop_patient` does, and emergency patients are never moved.
+    Each patient moved counts as a cancellation, and is rebooked into the first slot with room
+    from the next day.
 
-def daily_planning(env, beds, schedule, experiment):
+    Args:
+        env (simpy.Environment): The simulation environment.
+        beds (WardResource): The ward beds.
+        schedule (Any): Schedule object with time-indexed patient assignments.
+        metrics (Optional[MetricsRecorder]): Recorder whose summary counts the patients moved.
+
+    Returns:
+        int: The number of patients moved.
+    """
+    day_slots = schedule.slots_between(env.now, env.now + 24)
+    excess = sum(len(patients) for patients in day_slots.patients) - beds.forecast_free(
+        env.now + 24
+    )
+
+    deferred = []
+    for slot_id, patients in zip(day_slots.slot_ids[::-1], day_slots.patients[::-1]):
+        while (
+            excess > 0
+            and patients
+            and patients[-1].patient_type != PatientType.EMERGENCY
+        ):
+            patient = schedule.pop_patient(slot_id)
+            patient.cancellations.append(env.now)
+            if (summary := getattr(metrics, "summary", None)) is not None:
+                summary.cancellation(patient)
+            deferred.append(patient)
+            excess -= 1
+
+    if deferred:
+        logger.info("Moving %s patients to later days for want of beds.", len(deferred))
+        schedule.schedule_patients(deferred[::-1], env.now + 24)
+
+    return len(deferred)
+
+
+def daily_planning(
+    env,
+    beds,
+    schedule,
+    experiment,
+    metrics=None,
+    bed_aware_planning=False,
+    stream=None,
+):
     """
     Performs daily planning to ensure emergency patients are scheduled within acceptable wait times.
 
+    Emergency patients breaching in the next 24 hours are taken from the experiment's `breach_tracker`
+    when it has one, otherwise every patient in the experiment is checked. Breaching patients are
+    assigned in one pass over arrays of the day's non-emergency slot capacity, taking the first slot
+    with room, or else the first slot with enough non-emergency work to bump. With bed-aware
+    planning, `defer_for_beds` then moves patients the ward is not forecast to have beds for out
+    of the day, rather than leaving them to be cancelled at surgery.
+
     Args:
         env (simpy.Environment): The simulation environment.
         beds (simpy.Resource): Resource representing general hospital beds.
         schedule (Any): Schedule object with time-indexed patient assignments.
         experiment (Any): Object containing experiment configuration and patient data.
+        metrics (Optional[MetricsRecorder]): Recorder whose summary counts the elective patients bumped.
+        bed_aware_planning (bool, optional): Whether to move patients out of the day when the ward is
+            not forecast to have beds for them. Needs `beds` to be a `WardResource`. Defaults to False.
+        stream (Optional[RunStream]): If given, retires the finished parts of the run at the start of
+            each day. Defaults to keeping everything.
 
     Yields:
         simpy.events.Event: A SimPy timeout event that triggers every 24 simulation hours.
     """
     while True:
-        logging.info("New day!!!")
-        logging.info(f"{beds.count} beds used, {beds.users}")
-
-        emergency_patients = [
-            patient
-            for patient in experiment.patients
-            if "Emergency" in patient.id
-            and patient.surgical_time is None
-            and (env.now - patient.arrival_time + 24) > experiment.max_emergency_wait
-        ]
-
-        emergencies_scheduled = schedule.processed_schedule.loc[
-            (schedule.processed_schedule["hour"] >= env.now)
-            & (schedule.processed_schedule["hour"] < env.now + 24)
-            & (schedule.processed_schedule["patient_type"] == "Emergency"),
-            "patients",
-        ].values
-
-        emergencies_scheduled = [*itertools.chain.from_iterable(emergencies_scheduled)]
+        logger.info("New day!!!")
+        if stream is not None:
+            stream.retire(env, experiment, schedule, metrics, beds)
+        logger.info("%s beds used, %s", beds.count, beds.users)
+
+        if hasattr(experiment, "breach_tracker"):
+            emergency_patients = experiment.breach_tracker.breaching(env.now + 24)
+        else:
+            emergency_patients = [
+                patient
+                for patient in experiment.patients
+                if patient.patient_type == PatientType.EMERGENCY
+                and patient.surgical_time is None
+                and (env.now - patient.arrival_time + 24)
+                > experiment.max_emergency_wait
+            ]
+
+        day_slots = schedule.slots_between(env.now, env.now + 24)
+        scheduled_today = set(day_slots.slot_ids)
 
         emergency_patients_breaching = [
             patient
             for patient in emergency_patients
-            if patient not in emergencies_scheduled
+            if schedule.patient_slot(patient) not in scheduled_today
         ]
-        logging.info(
-            f"{len(emergency_patients_breaching)} patients are breaching! {emergency_patients_breaching}"
+        logger.info(
+            "%s patients are breaching! %s",
+            len(emergency_patients_breaching),
+            emergency_patients_breaching,
         )
 
-        non_emergencies_scheduled = schedule.processed_schedule.loc[
-            (schedule.processed_schedule["hour"] >= env.now)
-            & (schedule.processed_schedule["hour"] < env.now + 24)
-            & (schedule.processed_schedule["patient_type"] != "Emergency"),
-            ["patients", "hours_total", "hours_remaining"],
-        ]
+        non_emergency = day_slots.patient_types != PatientType.EMERGENCY.value
+        slot_ids = day_slots.slot_ids[non_emergency]
+        hours_total = day_slots.hours_total[non_emergency]
+        hours_remaining = day_slots.hours_remaining[non_emergency]
+        non_emergency_hours = np.array(
+            [
+                sum(
+                    p.surgery_duration
+                    for p in patients
+                    if p.patient_type != PatientType.EMERGENCY
+                )
+                for patients, keep in zip(day_slots.patients, non_emergency)
+                if keep
+            ],
+            dtype=float,
+        )
+        slot_index = {slot_id: i for i, slot_id in enumerate(slot_ids)}
 
         for patient in emergency_patients_breaching:
-            if (
-                len(
-                    non_emergencies_scheduled[
-                        non_emergencies_scheduled["hours_remaining"]
-                        > patient.surgery_duration
-                    ]
+            duration = patient.surgery_duration
+
+            fits = hours_remaining > duration
+            bumpable = (hours_total > duration) & (non_emergency_hours > duration)
+
+            if fits.any():
+                i = fits.argmax()
+                logger.info("Slotting patient %s into a non-elective slot.", patient)
+            elif bumpable.any():
+                i = bumpable.argmax()
+                logger.info(
+                    "Cancelling elective patients to fit patient %s in today.", patient
                 )
-                != 0
-            ):
-                logging.info(f"Slotting patient {patient} into a non-elective slot.")
-                schedule.cancel_patient(patient)
-                non_emergencies_scheduled.loc[
-                    non_emergencies_scheduled["hours_remaining"]
-                    > patient.surgery_duration,
-                    "patients",
-                ].iloc[0].insert(0, patient)
-
-            elif len(
-                non_emergencies_scheduled.loc[
-                    non_emergencies_scheduled["hours_total"] > patient.surgery_duration
-                ]
-            ):
-                for _, non_em in non_emergencies_scheduled.loc[
-                    non_emergencies_scheduled["hours_total"] > patient.surgery_duration,
-                    :,
-                ].iterrows():
-                    ne_surg_duration = sum(
-                        [
-                            patient.surgery_duration
-                            for patient in non_em.patients
-                            if "Emergency" not in patient.id
-                        ]
-                    )
-                    if ne_surg_duration > patient.surgery_duration:
-                        logging.info(
-                            f"Cancelling elective patients to fit patient {patient} in today."
-                        )
-                        schedule.cancel_patient(patient)
-                        
-                        non_em.patients.insert(0, patient)
-                        non_em.hours_remaining -= patient.surgery_duration
-                        while non_em.hours_remaining < 0:
-                            non_em_patient = non_em.patients.pop()
-                            non_em_patient.cancellations.append(env.now)
-                            schedule.schedule_patients(
-                                [non_em_patient], env.now
-                            )
-                            non_em.hours_remaining += non_em_patient.surgery_duration
-                    break
-                else:
-                    logging.info(
-                        f"Patient {patient} is unable to be rescheduled today!"
-                    )
+            elif (hours_total > duration).any():
+                logger.info("Patient %s is unable to be rescheduled today!", patient)
+                continue
             else:
-                logging.info(
-                    f"Patient {patient} is unable to be rescheduled today - no available slots!"
-                )
-
                 # surgery too long for anything we have scheduled!!
+                logger.info(
+                    "Patient %s is unable to be rescheduled today - no available slots!",
+                    patient,
+                )
+                continue
+
+            schedule.cancel_patient(patient)
+            schedule.insert_patient(slot_ids[i], patient)
+            hours_remaining[i] -= duration
+
+            while hours_remaining[i] < 0:
+                non_em_patient = schedule.pop_patient(slot_ids[i])
+                non_em_patient.cancellations.append(env.now)
+                if (summary := getattr(metrics, "summary", None)) is not None:
+                    summary.cancellation(non_em_patient)
+                hours_remaining[i] += non_em_patient.surgery_duration
+                non_emergency_hours[i] -= non_em_patient.surgery_duration
+
+                schedule.schedule_patients([non_em_patient], env.now)
+
+                # The bumped patient may be rebooked into another slot today
+                if (
+                    j := slot_index.get(schedule.patient_slot(non_em_patient))
+                ) is not None:
+                    hours_remaining[j] -= non_em_patient.surgery_duration
+                    non_emergency_hours[j] += non_em_patient.surgery_duration
+
+        if bed_aware_planning:
+            defer_for_beds(env, beds, schedule, metrics)
 
         yield env.timeout(24)
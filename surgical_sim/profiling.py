@@ -0,0 +1,263 @@
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict
+
+import pandas as pd
+import simpy
+
+__all__ = ["ProfiledEnvironment", "ProfiledSchedule", "RunProfile", "TimingStats"]
+
+# The schedule methods timed by `ProfiledSchedule`
+PROFILED_SCHEDULE_METHODS = frozenset(
+    [
+        "__getitem__",
+        "schedule_patients",
+        "book_patients",
+        "slots_between",
+        "slots_at",
+        "find_patient",
+        "patient_slot",
+        "cancel_patient",
+        "insert_patient",
+        "pop_patient",
+        "extend_to",
+    ]
+)
+
+
+@dataclass
+class TimingStats:
+    """
+    Call counts and timings of one SimPy process or schedule method.
+
+    Attributes:
+        calls (int): Number of processes started, or method calls.
+        seconds (float): Wall time spent running the process's own code, or in the method.
+        events (int): Number of events the process waited on. Always 0 for schedule methods.
+        simulated_hours (float): Simulation time spent waiting on those events.
+    """
+
+    calls: int = 0
+    seconds: float = 0.0
+    events: int = 0
+    simulated_hours: float = 0.0
+
+    def merge(self, other):
+        """
+        Adds another set of stats to these.
+
+        Args:
+            other (TimingStats): The stats to add.
+        """
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.events += other.events
+        self.simulated_hours += other.simulated_hours
+
+
+@dataclass
+class RunProfile:
+    """
+    Where the time of one or more replications went, per SimPy process and per schedule method.
+
+    Process times only cover the process's own code between yields, so they include the schedule
+    methods it calls but not SimPy's event handling, which makes up the rest of `seconds`. Schedule
+    stats also count the bookings of the waiting lists, made before the run starts.
+
+    Example:
+        profile = RunProfile()
+        single_run(inputs, config, seed, profile=profile)
+        profile.to_frame().sort_values("seconds")
+
+    Attributes:
+        runs (int): Number of replications profiled.
+        seconds (float): Wall time spent in `env.run`.
+        events (int): Number of events SimPy processed.
+        processes (Dict[str, TimingStats]): Stats of each process, keyed by its generator function name.
+        schedule (Dict[str, TimingStats]): Stats of each schedule method.
+    """
+
+    runs: int = 0
+    seconds: float = 0.0
+    events: int = 0
+    processes: Dict[str, TimingStats] = field(default_factory=dict)
+    schedule: Dict[str, TimingStats] = field(default_factory=dict)
+
+    def stats(self, section, name):
+        """
+        Gets the stats of a process or schedule method, creating them on first use.
+
+        Args:
+            section (str): "processes" or "schedule".
+            name (str): Name of the process or method.
+
+        Returns:
+            TimingStats: The stats.
+        """
+        stats = getattr(self, section)
+        if name not in stats:
+            stats[name] = TimingStats()
+        return stats[name]
+
+    def merge(self, other):
+        """
+        Adds the profile of other replications to this one.
+
+        Args:
+            other (RunProfile): The profile to add.
+        """
+        self.runs += other.runs
+        self.seconds += other.seconds
+        self.events += other.events
+        for section in ["processes", "schedule"]:
+            for name, stats in getattr(other, section).items():
+                self.stats(section, name).merge(stats)
+
+    @classmethod
+    def combined(cls, profiles):
+        """
+        Sums the profiles of several replications.
+
+        Args:
+            profiles (Iterable[RunProfile]): The profiles.
+
+        Returns:
+            RunProfile: The total profile.
+        """
+        total = cls()
+        for profile in profiles:
+            total.merge(profile)
+        return total
+
+    def to_frame(self):
+        """
+        Tabulates the stats of every process and schedule method.
+
+        Returns:
+            pd.DataFrame: One row per process and method, indexed by section and name, with the
+                columns of `TimingStats` and the share of `seconds` each accounts for.
+        """
+        frame = pd.DataFrame(
+            [
+                {"section": section, "name": name, **vars(stats)}
+                for section in ["processes", "schedule"]
+                for name, stats in getattr(self, section).items()
+            ],
+            columns=[
+                "section",
+                "name",
+                "calls",
+                "seconds",
+                "events",
+                "simulated_hours",
+            ],
+        ).set_index(["section", "name"])
+        frame["share"] = frame["seconds"] / self.seconds if self.seconds else 0.0
+        return frame
+
+
+def _profiled_process(generator, stats, env):
+    """
+    Runs a SimPy process generator, timing its code between yields.
+
+    Events and exceptions (e.g. interrupts) are passed through to the generator unchanged.
+    """
+    stats.calls += 1
+    resume, value = generator.send, None
+    while True:
+        start = perf_counter()
+        try:
+            event = resume(value)
+        except StopIteration as stop:
+            stats.seconds += perf_counter() - start
+            return stop.value
+        stats.seconds += perf_counter() - start
+        stats.events += 1
+
+        waited_from = env.now
+        try:
+            resume, value = generator.send, (yield event)
+        except BaseException as error:
+            resume, value = generator.throw, error
+        stats.simulated_hours += env.now - waited_from
+
+
+class ProfiledEnvironment(simpy.Environment):
+    """
+    A SimPy environment that times every process started in it, and counts the events it processes.
+
+    Used in place of `simpy.Environment` only when profiling, so unprofiled runs pay nothing.
+
+    Attributes:
+        profile (RunProfile): The profile the timings are added to.
+    """
+
+    def __init__(self, profile, initial_time=0):
+        """
+        Initializes the environment.
+
+        Args:
+            profile (RunProfile): The profile to add timings to.
+            initial_time (float, optional): The simulation start time. Defaults to 0.
+        """
+        super().__init__(initial_time)
+        self.profile = profile
+        profile.runs += 1
+
+    def process(self, generator):
+        stats = self.profile.stats("processes", generator.__qualname__)
+        return super().process(_profiled_process(generator, stats, self))
+
+    def step(self):
+        self.profile.events += 1
+        super().step()
+
+    def run(self, until=None):
+        start = perf_counter()
+        try:
+            return super().run(until)
+        finally:
+            self.profile.seconds += perf_counter() - start
+
+
+class ProfiledSchedule:
+    """
+    Times the calls made to a schedule's methods, passing everything else straight through.
+
+    Attributes:
+        schedule (Schedule): The schedule being profiled.
+        profile (RunProfile): The profile the timings are added to.
+    """
+
+    def __init__(self, schedule, profile):
+        """
+        Wraps a schedule.
+
+        Args:
+            schedule (Schedule): The schedule to profile.
+            profile (RunProfile): The profile to add timings to.
+        """
+        self.schedule = schedule
+        self.profile = profile
+
+    def __timed(self, name, method):
+        stats = self.profile.stats("schedule", name)
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.calls += 1
+                stats.seconds += perf_counter() - start
+
+        return timed
+
+    def __getitem__(self, time):
+        return self.__timed("__getitem__", self.schedule.__getitem__)(time)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.schedule, name)
+        if name in PROFILED_SCHEDULE_METHODS:
+            return self.__timed(name, attribute)
+        return attribute
@@ -1,6 +1,168 @@
+import bisect
+import heapq
+import itertools
 import logging
 
-__all__ = ["surgery", "ward"]
+import simpy
+
+__all__ = [
+    "WardResource",
+    "surgery",
+    "ward",
+    "bed_preload",
+    "initialise_ward_random",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class WardResource(simpy.Resource):
+    """
+    A SimPy resource for ward beds that keeps its own occupancy timeline and the times its occupied
+    beds are due to be freed.
+
+    The timeline gains a point each time a bed is taken or freed, so past occupancy is a bisection
+    rather than a rebuild from the bed events. Discharge times are kept in a heap; entries for beds
+    already freed are dropped lazily when they reach the top, or all at once when they outnumber the
+    beds still due to be freed.
+
+    Attributes:
+        times (List[float]): Times occupancy changed, in order, starting with the creation time.
+        counts (List[int]): Beds occupied from each of `times`.
+    """
+
+    def __init__(self, env, capacity=1):
+        """
+        Initializes the resource with no beds occupied.
+
+        Args:
+            env (simpy.Environment): The simulation environment.
+            capacity (int, optional): Number of beds. Defaults to 1.
+        """
+        super().__init__(env, capacity)
+        self.times = [env.now]
+        self.counts = [0]
+        self._discharges = []
+        self._due = {}
+        self._order = itertools.count()
+
+    def _record(self):
+        if self.times[-1] == self._env.now:
+            self.counts[-1] = len(self.users)
+        else:
+            self.times.append(self._env.now)
+            self.counts.append(len(self.users))
+
+    def _do_put(self, event):
+        count = len(self.users)
+        super()._do_put(event)
+        if len(self.users) != count:
+            self._record()
+
+    def _do_get(self, event):
+        count = len(self.users)
+        super()._do_get(event)
+        if len(self.users) != count:
+            self._due.pop(event.request, None)
+            if len(self._discharges) > 2 * len(self._due) + 64:
+                self._compact()
+            self._record()
+
+    def schedule_discharge(self, request, time):
+        """
+        Records when the bed held by a request is due to be freed.
+
+        Args:
+            request (simpy.Resource.request): The granted bed request.
+            time (float): The discharge time.
+        """
+        order = next(self._order)
+        self._due[request] = order
+        heapq.heappush(self._discharges, (time, order, request))
+
+    def _live(self, entry):
+        return self._due.get(entry[2]) == entry[1]
+
+    def _compact(self):
+        self._discharges = [entry for entry in self._discharges if self._live(entry)]
+        heapq.heapify(self._discharges)
+
+    def _next_discharge(self):
+        while self._discharges:
+            if self._live(self._discharges[0]):
+                return self._discharges[0][0]
+            heapq.heappop(self._discharges)
+        return None
+
+    @property
+    def occupied(self):
+        """
+        int: Number of beds occupied now.
+        """
+        return len(self.users)
+
+    def occupancy_at(self, time):
+        """
+        Looks up the number of beds occupied at a past time.
+
+        Args:
+            time (float): The time, no earlier than the resource's creation.
+
+        Returns:
+            int: Beds occupied at that time, after any changes made at it.
+        """
+        return self.counts[bisect.bisect_right(self.times, time) - 1]
+
+    def retire(self, before):
+        """
+        Drops the timeline before a time, keeping the occupancy at that time, and the discharges of
+        beds already freed, for long runs.
+
+        Args:
+            before (float): The earliest time `occupancy_at` is still needed for.
+        """
+        start = max(bisect.bisect_right(self.times, before) - 1, 0)
+        del self.times[:start]
+        del self.counts[:start]
+
+        self._compact()
+
+    def next_free(self):
+        """
+        Finds when a bed is next free, from the discharges scheduled so far.
+
+        Returns:
+            Optional[float]: The current time if a bed is free now, otherwise the earliest scheduled
+                discharge, or None if no occupied bed has one.
+        """
+        if len(self.users) < self.capacity:
+            return self._env.now
+        return self._next_discharge()
+
+    def forecast_free(self, until):
+        """
+        Forecasts the beds free by a time: those free now plus those due to be freed by then.
+
+        Beds taken in the meantime are not counted against it. Only the part of the discharge heap
+        due by the time is walked, so the cost grows with the beds freed by then rather than with
+        every occupied bed.
+
+        Args:
+            until (float): The time to forecast to.
+
+        Returns:
+            int: The number of beds.
+        """
+        heap, due_order = self._discharges, self._due
+        due = 0
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            if i < len(heap) and heap[i][0] <= until:
+                _, order, request = heap[i]
+                due += due_order.get(request) == order
+                stack += (2 * i + 1, 2 * i + 2)
+        return self.capacity - len(self.users) + due
 
 
 def surgery(
@@ -11,18 +173,22 @@ def surgery(
 
     Args:
         env (simpy.Environment): The simulation environment.
-        beds (simpy.Resource): Resource representing general hospital beds.
+        beds (simpy.Resource): Resource representing general hospital beds. A `WardResource` is also
+            told when each patient's bed is due to be freed.
         cc_beds (simpy.Resource): Resource representing critical care beds.
         patients (List[Any]): List of patient objects, each with attributes like `surgery_duration`, `id`, and `cancellations`.
         hours_available (float): Number of hours available for surgeries in the current simulation window.
         schedule (Any): Scheduling object with a method `schedule_patients` to reschedule patients.
-        experiment (Any): Placeholder for experiment configuration or metadata (not used directly in this function).
-        metrics (Dict[str, List[Any]]): Dictionary to record various simulation metrics such as bed usage and surgical events.
+        experiment (Any): Experiment configuration; its `breach_tracker`, if present, stops tracking patients once they are operated on.
+        metrics (MetricsRecorder): Recorder for simulation metrics such as bed usage and surgical events. Its
+            summary counters, if it has them, are updated as patients are operated on and cancelled.
 
     Returns:
         simpy.events.Event: A SimPy event that represents the completion of the surgery process.
     """
     end_time = env.now + hours_available
+    # Plain dictionaries of metrics, as the notebooks use, have no summary counters
+    summary = getattr(metrics, "summary", None)
 
     metrics["beds"].append((env.now, beds.count))
     for patient in patients:
@@ -31,17 +197,17 @@ def surgery(
 
         cc_bed_req = cc_beds.request()
         result = yield env.any_of([cc_bed_req, timeout])
-        logging.info(f"Requesting cc bed for patient {patient}")
+        logger.info("Requesting cc bed for patient %s", patient)
 
         if cc_bed_req in result:
             metrics["beds"].append((env.now, beds.count))
 
-            logging.info(f"Assigned cc bed to {patient}")
+            logger.info("Assigned cc bed to %s", patient)
             metrics["cc_bed_event"].append((env.now, 1))
 
             bed_req = beds.request()
 
-            logging.info(f"Requesting bed for patient {patient}")
+            logger.info("Requesting bed for patient %s", patient)
             timeout = env.timeout(
                 max(0, end_time - env.now - patient.surgery_duration - 1)
             )
@@ -50,17 +216,33 @@ def surgery(
             if bed_req in result:
                 metrics["beds"].append((env.now, beds.count))
 
-                logging.info(f"Assigned bed to {patient}")
+                logger.info("Assigned bed to %s", patient)
                 metrics["bed_event"].append((env.now, 1))
 
                 surgical_time = env.now
                 metrics["surgical_event"].append((surgical_time, 1))
 
+                if isinstance(beds, WardResource):
+                    beds.schedule_discharge(
+                        bed_req,
+                        surgical_time
+                        + patient.surgery_duration
+                        + patient.recovery_time,
+                    )
+
                 patient.surgical_time = surgical_time
+                if summary is not None:
+                    summary.surgery(
+                        patient,
+                        surgical_time,
+                        getattr(experiment, "max_emergency_wait", None),
+                    )
+                if hasattr(experiment, "breach_tracker"):
+                    experiment.breach_tracker.discard(patient)
 
                 yield env.timeout(patient.surgery_duration)
-                logging.info(
-                    f"{patient.id} had surgery for: {patient.surgery_duration} hours"
+                logger.info(
+                    "%s had surgery for: %s hours", patient.id, patient.surgery_duration
                 )
                 metrics["surgical_event"].append((env.now, -1))
 
@@ -73,8 +255,12 @@ def surgery(
                 metrics["beds"].append((env.now, beds.count))
 
             else:
-                logging.info(
-                    f"{patient.id} cancelled, beds at {beds.count}, hours remaining: {end_time - env.now}, surgical duration: {patient.surgery_duration}"
+                logger.info(
+                    "%s cancelled, beds at %s, hours remaining: %s, surgical duration: %s",
+                    patient.id,
+                    beds.count,
+                    end_time - env.now,
+                    patient.surgery_duration,
                 )
                 schedule.schedule_patients([patient], env.now)
 
@@ -82,16 +268,24 @@ def surgery(
                 metrics["cc_bed_event"].append((env.now, -1))
 
                 patient.cancellations.append(env.now)
+                if summary is not None:
+                    summary.cancellation(patient)
 
                 bed_req.cancel()
 
         else:
-            logging.info(
-                f"{patient.id} cancelled, cc beds at {cc_beds.count}, hours remaining: {end_time - env.now}, surgical duration: {patient.surgery_duration}"
+            logger.info(
+                "%s cancelled, cc beds at %s, hours remaining: %s, surgical duration: %s",
+                patient.id,
+                cc_beds.count,
+                end_time - env.now,
+                patient.surgery_duration,
             )
             schedule.schedule_patients([patient], env.now)
 
             patient.cancellations.append(env.now)
+            if summary is not None:
+                summary.cancellation(patient)
 
             cc_bed_req.cancel()
 
@@ -105,7 +299,7 @@ def ward(env, beds, bed_req, patient, metrics):
         beds (simpy.Resource): Resource representing general hospital beds.
         bed_req (simpy.Resource.request): The specific bed request allocated to the patient.
         patient (Any): The patient object, expected to have attributes like `recovery_time`, `id`, and `discharge_time`.
-        metrics (Dict[str, list]): Dictionary for tracking simulation metrics such as bed usage and discharge events.
+        metrics (MetricsRecorder): Recorder for simulation metrics such as bed usage and discharge events.
 
     Returns:
         simpy.events.Event: A SimPy event representing the completion of the recovery process.
@@ -117,4 +311,47 @@ def ward(env, beds, bed_req, patient, metrics):
     metrics["beds"].append((env.now, beds.count))
 
     patient.discharge_time = env.now
-    logging.info(f"{patient.id} discharged, beds now at: {beds.count}, {beds.users}.")
+    if (summary := getattr(metrics, "summary", None)) is not None:
+        summary.discharge(patient)
+    logger.info(
+        "%s discharged, beds now at: %s, %s.", patient.id, beds.count, beds.users
+    )
+
+
+def bed_preload(env, beds, remaining_los, metrics):
+    """
+    Occupies a bed with a patient already on the ward at the start of the simulation.
+
+    Args:
+        env (simpy.Environment): The simulation environment.
+        beds (simpy.Resource): Resource representing general hospital beds.
+        remaining_los (float): Time until the patient is discharged.
+        metrics (MetricsRecorder): Recorder for simulation metrics such as bed usage.
+
+    Returns:
+        simpy.events.Event: A SimPy event representing the remainder of the patient's stay.
+    """
+    with beds.request() as bed_req:
+        yield bed_req
+        metrics["bed_event"].append((env.now, 1))
+        if isinstance(beds, WardResource):
+            beds.schedule_discharge(bed_req, env.now + remaining_los)
+        yield env.timeout(remaining_los)
+        metrics["bed_event"].append((env.now, -1))
+
+
+def initialise_ward_random(env, beds, initial_num_occupied_beds, experiment, metrics):
+    """
+    Fills the ward with patients whose remaining lengths of stay are sampled from the experiment.
+
+    Args:
+        env (simpy.Environment): The simulation environment.
+        beds (simpy.Resource): Resource representing general hospital beds.
+        initial_num_occupied_beds (int): Number of beds occupied at the start of the simulation.
+        experiment (Any): Object with a `remaining_los_dist` sampler.
+        metrics (MetricsRecorder): Recorder for simulation metrics such as bed usage.
+    """
+    for time_remaining in experiment.remaining_los_dist.sample(
+        initial_num_occupied_beds
+    ):
+        env.process(bed_preload(env, beds, time_remaining, metrics))
@@ -0,0 +1,309 @@
+import dataclasses
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["ResultStore", "read_combined_csv", "read_wide_csv"]
+
+# Column names and dtypes of the stored rows
+RESULT_COLUMNS = {
+    "scenario": np.int32,
+    "replication": np.int32,
+    "metric": np.int16,
+    "value": np.float64,
+}
+
+
+def _plain(value):
+    """
+    Converts numpy scalars into the Python values they hold, so they can be written as JSON.
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ResultStore:
+    """
+    A columnar, append-only store of sweep results, with one row per scenario x replication x metric.
+
+    Each append writes a chunk directory holding one `.npy` file per column. Chunks are read back
+    memory-mapped, so loading one metric or scenario only copies the matching rows. Scenarios and
+    metric names are stored once, in `store.json`, and referred to by integer codes in the rows.
+
+    Attributes:
+        directory (Path): The directory holding the store.
+    """
+
+    def __init__(self, directory):
+        """
+        Opens a store, creating an empty one if the directory does not hold one.
+
+        Args:
+            directory (Union[str, Path]): The directory holding the store.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        meta_path = self.directory / "store.json"
+        if meta_path.exists():
+            with open(meta_path, "r") as fin:
+                self.__meta = json.load(fin)
+        else:
+            self.__meta = {"scenarios": [], "metrics": [], "chunks": []}
+
+    @property
+    def metrics(self):
+        """
+        List[str]: The names of the stored metrics.
+        """
+        return list(self.__meta["metrics"])
+
+    def scenarios(self):
+        """
+        Lists the stored scenarios.
+
+        Returns:
+            pd.DataFrame: The parameters of each scenario, indexed by scenario id.
+        """
+        return pd.DataFrame(self.__meta["scenarios"]).rename_axis("scenario")
+
+    def __len__(self):
+        return sum(rows for _, rows in self.__meta["chunks"])
+
+    def __save_meta(self):
+        """
+        Writes the metadata, replacing the previous version atomically.
+        """
+        path = self.directory / "store.json"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as fout:
+            json.dump(self.__meta, fout)
+        tmp.replace(path)
+
+    def __scenario_id(self, params):
+        """
+        Looks up the id of a scenario, adding it if it is new.
+        """
+        params = {k: _plain(v) for k, v in params.items()}
+        scenarios = self.__meta["scenarios"]
+        try:
+            return scenarios.index(params)
+        except ValueError:
+            scenarios.append(params)
+            return len(scenarios) - 1
+
+    def __metric_id(self, metric):
+        """
+        Looks up the code of a metric, adding it if it is new.
+        """
+        metrics = self.__meta["metrics"]
+        try:
+            return metrics.index(metric)
+        except ValueError:
+            metrics.append(metric)
+            return len(metrics) - 1
+
+    def __write_chunk(self, columns):
+        """
+        Writes one chunk of rows, then records it in the metadata.
+
+        Args:
+            columns (Dict[str, np.ndarray]): The values of each of `RESULT_COLUMNS`.
+        """
+        name = f"chunk-{len(self.__meta['chunks']):05d}"
+        chunk_dir = self.directory / name
+        chunk_dir.mkdir(exist_ok=True)
+
+        for column, dtype in RESULT_COLUMNS.items():
+            np.save(
+                chunk_dir / f"{column}.npy", np.asarray(columns[column], dtype=dtype)
+            )
+
+        self.__meta["chunks"].append([name, len(columns["value"])])
+        self.__save_meta()
+
+    def append(self, sweep):
+        """
+        Appends the summary metrics of a sweep.
+
+        Replications are numbered in seed order within each scenario. The root seed is not stored, as
+        it is not a swept parameter.
+
+        Args:
+            sweep (Union[SweepResults, Iterable[ReplicationResults]]): The sweep to store.
+        """
+        columns = {column: [] for column in RESULT_COLUMNS}
+
+        for scenario in sweep:
+            params = dataclasses.asdict(scenario.config)
+            del params["seed"]
+            scenario_id = self.__scenario_id(params)
+
+            for metric, values in scenario.summary.items():
+                columns["scenario"].append(np.full(len(values), scenario_id))
+                columns["replication"].append(np.arange(len(values)))
+                columns["metric"].append(np.full(len(values), self.__metric_id(metric)))
+                columns["value"].append(values)
+
+        if columns["value"]:
+            self.__write_chunk({k: np.concatenate(v) for k, v in columns.items()})
+
+    def append_frame(self, frame):
+        """
+        Appends results held in a long DataFrame.
+
+        Args:
+            frame (pd.DataFrame): One row per result, with `replication`, `metric` and `value` columns.
+                Every other column is treated as a scenario parameter.
+        """
+        params = [
+            c for c in frame.columns if c not in ["replication", "metric", "value"]
+        ]
+
+        if params:
+            keys = frame[params].drop_duplicates()
+            scenario_ids = frame[params].merge(
+                keys.assign(
+                    scenario=[
+                        self.__scenario_id(dict(row)) for _, row in keys.iterrows()
+                    ]
+                ),
+                on=params,
+                how="left",
+            )["scenario"]
+        else:
+            scenario_ids = np.full(len(frame), self.__scenario_id({}))
+
+        self.__write_chunk(
+            {
+                "scenario": scenario_ids,
+                "replication": frame["replication"].values,
+                "metric": [self.__metric_id(m) for m in frame["metric"]],
+                "value": frame["value"].values,
+            }
+        )
+
+    def load(self, metric=None, scenario=None, parameters=True, **params):
+        """
+        Loads a slice of the results.
+
+        Example:
+            store.load("emergency_patients_seen", num_beds=50)
+
+        Args:
+            metric (Optional[Union[str, List[str]]]): Metric(s) to load. Defaults to all metrics.
+            scenario (Optional[Union[int, List[int]]]): Scenario id(s) to load. Defaults to all scenarios.
+            parameters (bool, optional): Include the scenario parameters as columns. Defaults to True.
+            **params: Only load scenarios with these parameter values.
+
+        Returns:
+            pd.DataFrame: The matching rows, with `scenario`, `replication`, `metric` and `value` columns.
+        """
+        scenarios = self.scenarios()
+
+        scenario_ids = None
+        if scenario is not None:
+            scenario_ids = np.atleast_1d(scenario)
+        if params:
+            matches = scenarios.index[
+                np.logical_and.reduce(
+                    [scenarios[k] == v for k, v in params.items()]
+                ).astype(bool)
+            ]
+            scenario_ids = (
+                matches
+                if scenario_ids is None
+                else np.intersect1d(scenario_ids, matches)
+            )
+
+        metric_ids = None
+        if metric is not None:
+            metrics = self.__meta["metrics"]
+            metric_ids = [
+                metrics.index(m) for m in np.atleast_1d(metric) if m in metrics
+            ]
+
+        selected = {column: [] for column in RESULT_COLUMNS}
+        for name, _ in self.__meta["chunks"]:
+            chunk = {
+                column: np.load(self.directory / name / f"{column}.npy", mmap_mode="r")
+                for column in RESULT_COLUMNS
+            }
+
+            mask = np.ones(len(chunk["value"]), dtype=bool)
+            if scenario_ids is not None:
+                mask &= np.isin(chunk["scenario"], scenario_ids)
+            if metric_ids is not None:
+                mask &= np.isin(chunk["metric"], metric_ids)
+
+            for column in RESULT_COLUMNS:
+                selected[column].append(np.asarray(chunk[column][mask]))
+
+        frame = pd.DataFrame(
+            {
+                column: (
+                    np.concatenate(selected[column])
+                    if selected[column]
+                    else np.empty(0, dtype=dtype)
+                )
+                for column, dtype in RESULT_COLUMNS.items()
+            }
+        )
+        frame["metric"] = pd.Categorical.from_codes(
+            frame["metric"], categories=self.__meta["metrics"]
+        )
+
+        if parameters and len(scenarios.columns):
+            frame = frame.join(scenarios, on="scenario")
+
+        return frame
+
+
+def read_combined_csv(path):
+    """
+    Reads a results CSV with one list of replication values per metric and scenario, such as
+    `results/res1_available_beds_combined.csv`.
+
+    Args:
+        path (Union[str, Path]): The CSV file, with `metric` and `value` columns and a column per scenario parameter.
+
+    Returns:
+        pd.DataFrame: One row per scenario, replication and metric, ready for `ResultStore.append_frame`.
+    """
+    frame = pd.read_csv(path)
+    frame["value"] = frame["value"].map(json.loads)
+    frame["replication"] = frame["value"].map(lambda values: range(len(values)))
+
+    return frame.explode(["value", "replication"], ignore_index=True).astype(
+        {"value": float, "replication": int}
+    )
+
+
+def read_wide_csv(path, parameter):
+    """
+    Reads a results CSV with one row per metric and one column of replication lists per value of a
+    single parameter, such as `results/res2_additional_capacity.csv`.
+
+    Args:
+        path (Union[str, Path]): The CSV file.
+        parameter (str): The name of the parameter the columns correspond to, e.g. "additional_capacity_days".
+
+    Returns:
+        pd.DataFrame: One row per scenario, replication and metric, ready for `ResultStore.append_frame`.
+    """
+    frame = (
+        pd.read_csv(path, index_col=0)
+        .rename_axis("metric")
+        .rename_axis(parameter, axis=1)
+        .stack()
+        .rename("value")
+        .reset_index()
+    )
+    frame[parameter] = pd.to_numeric(frame[parameter])
+    frame["value"] = frame["value"].map(json.loads)
+    frame["replication"] = frame["value"].map(lambda values: range(len(values)))
+
+    return frame.explode(["value", "replication"], ignore_index=True).astype(
+        {"value": float, "replication": int}
+    )
@@ -0,0 +1,222 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .model import (OCCUPANCY_CHANNELS, SUMMARY_METRICS, ModelInputs,
+                    RunConfig, build_schedule, schedule_layout, single_run,
+                    theatre_slots)
+from .profiling import RunProfile
+
+__all__ = ["ReplicationResults", "replication_seeds", "run_replications"]
+
+replication_result = namedtuple(
+    "replication_result", ["seed", "summary", "occupancy", "profile"], defaults=[None]
+)
+
+# Inputs shared by every task a worker process runs, set once by `_init_worker`
+_worker_inputs = None
+
+# Whether a worker process profiles the replications it runs, set by `_init_worker`
+_worker_profile = False
+
+# Empty schedules built in a worker process, keyed by the config fields that shape them
+_worker_schedules = {}
+
+
+def _init_worker(inputs, profile=False):
+    """
+    Stores the shared model inputs in a worker process and silences simulation logging.
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+        profile (bool, optional): Profile each replication. Defaults to False.
+    """
+    global _worker_inputs, _worker_profile
+    _worker_inputs = inputs
+    _worker_profile = profile
+    _worker_schedules.clear()
+
+    logging.getLogger(__package__).setLevel(logging.CRITICAL + 1)
+
+
+def _run_task(task):
+    """
+    Runs one replication in a worker process and reduces it to compact arrays.
+
+    The empty schedule is built once per worker and scenario layout, and copied for each replication.
+
+    Args:
+        task (Tuple[RunConfig, int]): The scenario parameters and replication seed.
+
+    Returns:
+        replication_result: The seed, summary metrics and occupancy step functions of the replication,
+            and its profile if the worker is profiling.
+    """
+    config, seed = task
+    key = schedule_layout(config)
+    if key not in _worker_schedules:
+        _worker_schedules[key] = build_schedule(theatre_slots(_worker_inputs, config))
+
+    profile = RunProfile() if _worker_profile else None
+    _, _, metrics = single_run(
+        _worker_inputs,
+        config,
+        seed,
+        schedule=_worker_schedules[key].copy(),
+        profile=profile,
+    )
+
+    return replication_result(
+        seed,
+        metrics.summary.record(),
+        {name: metrics.occupancy(key) for name, key in OCCUPANCY_CHANNELS.items()},
+        profile,
+    )
+
+
+def _run_tasks(tasks, inputs, workers=None, chunksize=1, profile=False):
+    """
+    Runs replication tasks, in this process or across a pool of worker processes, yielding each
+    result as it becomes available.
+
+    Args:
+        tasks (List[Tuple[RunConfig, int]]): The scenario parameters and seed of each replication.
+        inputs (ModelInputs): The model inputs, sent to each worker once.
+        workers (Optional[int]): Number of worker processes. Defaults to the number of CPUs; 1 runs in this process.
+        chunksize (int, optional): Number of tasks sent to a worker at a time. Defaults to 1.
+        profile (bool, optional): Profile each replication. Defaults to False.
+
+    Yields:
+        replication_result: The result of each task, in task order.
+    """
+    if workers == 1:
+        package_logger = logging.getLogger(__package__)
+        level = package_logger.level
+        _init_worker(inputs, profile)
+        try:
+            for task in tasks:
+                yield _run_task(task)
+        finally:
+            package_logger.setLevel(level)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(inputs, profile)
+    ) as pool:
+        yield from pool.map(_run_task, tasks, chunksize=chunksize)
+
+
+def replication_seeds(seed, n):
+    """
+    Spawns one seed per replication from a single `SeedSequence`.
+
+    Args:
+        seed (int): The root seed.
+        n (int): Number of replications.
+
+    Returns:
+        List[int]: A seed for each replication.
+    """
+    return [
+        int(child.generate_state(1)[0])
+        for child in np.random.SeedSequence(seed).spawn(n)
+    ]
+
+
+class ReplicationResults:
+    """
+    The compact results of a set of replications of one scenario.
+
+    Attributes:
+        config (RunConfig): The scenario parameters.
+        seeds (np.ndarray): The seed of each replication.
+        summary (Dict[str, np.ndarray]): Each summary metric, one value per replication.
+        occupancy (Dict[str, List[Tuple[np.ndarray, np.ndarray]]]): Bed, critical care bed and theatre occupancy
+            step functions (event times and occupancy) for each replication. Empty if the step functions
+            were streamed into an ensemble instead.
+        profile (Optional[RunProfile]): The profiles of the replications, summed, if they were profiled.
+    """
+
+    def __init__(self, config, results):
+        """
+        Collects the results returned by the workers.
+
+        Args:
+            config (RunConfig): The scenario parameters.
+            results (List[replication_result]): The result of each replication.
+        """
+        self.config = config
+        self.seeds = np.array([r.seed for r in results], dtype=np.int64)
+        self.summary = {
+            metric: np.array(
+                [r.summary.get(metric, np.nan) for r in results], dtype=float
+            )
+            for metric in SUMMARY_METRICS
+        }
+        self.occupancy = {
+            name: [r.occupancy[name] for r in results if r.occupancy is not None]
+            for name in OCCUPANCY_CHANNELS
+        }
+
+        profiles = [r.profile for r in results if r.profile is not None]
+        self.profile = RunProfile.combined(profiles) if profiles else None
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def to_frame(self):
+        """
+        Converts the summary metrics into a DataFrame.
+
+        Returns:
+            pd.DataFrame: One row per replication, with the seed and each summary metric.
+        """
+        return pd.DataFrame({"seed": self.seeds, **self.summary})
+
+
+def run_replications(
+    config=RunConfig(),
+    n=100,
+    workers=None,
+    inputs=None,
+    chunksize=1,
+    ensemble=None,
+    profile=False,
+):
+    """
+    Runs replications of a scenario across a pool of worker processes.
+
+    Replication seeds are spawned from `config.seed`. The model inputs are sent to each worker once,
+    when it starts, rather than with every task, and each replication returns summary metrics and
+    occupancy arrays rather than its patients and schedule.
+
+    Args:
+        config (RunConfig, optional): The scenario parameters. Defaults to RunConfig().
+        n (int, optional): Number of replications. Defaults to 100.
+        workers (Optional[int]): Number of worker processes. Defaults to the number of CPUs; 1 runs in this process.
+        inputs (ModelInputs, optional): The model inputs. Defaults to those in the repository's `data/` directory.
+        chunksize (int, optional): Number of replications sent to a worker at a time. Defaults to 1.
+        ensemble (Optional[EnsembleAggregator]): If given, each replication's occupancy is added to it as the
+            replication finishes, rather than kept in the results.
+        profile (bool, optional): Time each SimPy process and schedule method, summing the timings of every
+            replication into `ReplicationResults.profile`. Defaults to False.
+
+    Returns:
+        ReplicationResults: The results of every replication, in seed order.
+    """
+    if inputs is None:
+        inputs = ModelInputs.from_directory()
+
+    tasks = [(config, seed) for seed in replication_seeds(config.seed, n)]
+
+    results = []
+    for result in _run_tasks(tasks, inputs, workers, chunksize, profile):
+        if ensemble is not None:
+            ensemble.add(result.occupancy)
+            result = result._replace(occupancy=None)
+        results.append(result)
+
+    return ReplicationResults(config, results)
@@ -1,3 +1,4 @@
+import bisect
 import itertools
 import logging
 from collections import defaultdict, namedtuple
@@ -5,14 +6,152 @@ from collections import defaultdict, namedtuple
 import numpy as np
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+SCHEDULE_COLUMNS = [
+    "hour",
+    "patient_type",
+    "hours_total",
+    "hours_remaining",
+    "patients",
+]
+
+
+class _SlotTree:
+    """
+    An append-only max segment tree over the hours remaining of one patient type's slots.
+
+    Slots are stored in hour order, so "the first slot after position i with more than d hours
+    remaining" is answered by descending the tree in O(log n) rather than scanning every slot.
+    """
+
+    def __init__(self, values=()):
+        """
+        Builds the tree bottom-up from an initial list of values.
+
+        Args:
+            values (Iterable[float]): Initial hours remaining, in slot order.
+        """
+        self.__build(list(values))
+
+    def __build(self, values, capacity=1):
+        """
+        Lays out the leaves and computes every internal maximum.
+
+        Args:
+            values (List[float]): Hours remaining, in slot order.
+            capacity (int, optional): Minimum number of leaves to allocate. Defaults to 1.
+        """
+        self.__n = len(values)
+        self.__size = 1
+        while self.__size < max(self.__n, capacity):
+            self.__size *= 2
+
+        self.__tree = [-np.inf] * (2 * self.__size)
+        self.__tree[self.__size : self.__size + self.__n] = values
+        for i in range(self.__size - 1, 0, -1):
+            self.__tree[i] = max(self.__tree[2 * i], self.__tree[2 * i + 1])
+
+    def __len__(self):
+        return self.__n
+
+    def copy(self):
+        """
+        Copies the tree, so the copy can be updated independently.
+
+        Returns:
+            _SlotTree: The copy.
+        """
+        tree = _SlotTree.__new__(_SlotTree)
+        tree.__n = self.__n
+        tree.__size = self.__size
+        tree.__tree = list(self.__tree)
+        return tree
+
+    def extend(self, values):
+        """
+        Adds values to the end of the tree in one bulk rebuild.
+
+        Capacity at least doubles whenever it runs out, so the cost of a rebuild is amortised
+        over the values appended.
+
+        Args:
+            values (List[float]): Hours remaining of the new slots, in slot order.
+        """
+        leaves = self.__tree[self.__size : self.__size + self.__n] + list(values)
+        if len(leaves) <= self.__size:
+            for position in range(self.__n, len(leaves)):
+                self.update(position, leaves[position])
+            self.__n = len(leaves)
+        else:
+            self.__build(leaves, 2 * self.__size)
+
+    def assign(self, values):
+        """
+        Replaces every value in one bulk rebuild, e.g. after booking many slots at once.
+
+        Args:
+            values (List[float]): Hours remaining of every slot, in slot order.
+        """
+        self.__build(list(values), self.__size)
+
+    def update(self, position, value):
+        """
+        Sets the value at a position and refreshes the maxima above it.
+
+        Args:
+            position (int): Position of the slot within its patient type.
+            value (float): New hours remaining.
+        """
+        tree = self.__tree
+        i = position + self.__size
+        tree[i] = value
+        i //= 2
+        while i:
+            tree[i] = max(tree[2 * i], tree[2 * i + 1])
+            i //= 2
+
+    def first_greater(self, start, threshold):
+        """
+        Finds the first position at or after `start` whose value is strictly greater than `threshold`.
+
+        Args:
+            start (int): First position to consider.
+            threshold (float): Value that must be exceeded.
+
+        Returns:
+            Optional[int]: The matching position, or None if there is no such slot.
+        """
+        if start >= self.__n:
+            return None
+
+        tree = self.__tree
+        i = start + self.__size
+        while True:
+            if tree[i] > threshold:
+                while i < self.__size:
+                    i = 2 * i if tree[2 * i] > threshold else 2 * i + 1
+                return i - self.__size
+
+            # Move to the subtree immediately to the right of this one
+            while i & 1:
+                i >>= 1
+            if i == 0:
+                return None
+            i += 1
+
 
 class Schedule:
     """
     A class to manage and allocate surgery slots for patients based on repeatable time windows.
 
+    Slots are held in an internal store indexed by patient type and ordered by hour, so finding
+    the next slot that fits a patient is logarithmic in the number of slots.
+
     Attributes:
         lcm (int): Least common multiple of all slot repeat periods.
-        processed_schedule (pd.DataFrame): A DataFrame representing the expanded and structured schedule.
+        processed_schedule (pd.DataFrame): A DataFrame representing the expanded and structured schedule,
+            materialised lazily from the internal slot store.
     """
 
     def __init__(self, slots):
@@ -27,7 +166,89 @@ class Schedule:
 
         self.__process_slots(slots)
 
-        self.processed_schedule = self.__process_schedule(self.__schedule)
+        template = [
+            (time, *list(slot.items())[0])
+            for time, slots in self.__schedule.items()
+            for slot in slots
+        ]
+        self.__build_store(
+            [hour for hour, _, _ in template],
+            [patient_type for _, patient_type, _ in template],
+            [hours_total for _, _, hours_total in template],
+        )
+
+    @classmethod
+    def from_table(cls, table, repeat_period=None):
+        """
+        Builds a schedule directly from a table of slots, such as `data/theatre_schedule.csv`.
+
+        The table is indexed in one vectorised pass rather than expanded slot by slot.
+
+        Args:
+            table (Union[pd.DataFrame, Dict[str, ArrayLike]]): `hour`, `patient_type` and `hours_total` columns, and
+                optionally `hours_remaining` and `patients` columns.
+            repeat_period (Optional[int]): Period, in hours, the table repeats with. The schedule repeats after
+                the smallest multiple of it past the last slot. Defaults to repeating from the hour after the last slot.
+
+        Returns:
+            Schedule: The schedule.
+        """
+        schedule = cls.__new__(cls)
+        schedule.__schedule = {}
+        schedule.lcm = 1 if repeat_period is None else repeat_period
+
+        schedule.__build_store(
+            table["hour"],
+            table["patient_type"],
+            table["hours_total"],
+            table.get("hours_remaining"),
+            table.get("patients"),
+        )
+        return schedule
+
+    def copy(self, patients=None):
+        """
+        Copies the schedule, e.g. to reuse a schedule built once as a template for each replication.
+
+        The slot store and its indexes are copied, so bookings in the copy do not affect the original.
+
+        Args:
+            patients (Dict[str, Any], optional): Copies of the booked patients, keyed by patient ID, to book in
+                place of the originals. Defaults to sharing the booked patients with the original.
+
+        Returns:
+            Schedule: The copy.
+        """
+        schedule = type(self).__new__(type(self))
+        schedule.__schedule = self.__schedule
+        schedule.lcm = self.lcm
+
+        schedule.__template = self.__template
+        schedule.__period = self.__period
+        schedule.__periods = self.__periods
+
+        schedule.__hours = list(self.__hours)
+        schedule.__types = list(self.__types)
+        schedule.__totals = list(self.__totals)
+        schedule.__remaining = list(self.__remaining)
+        schedule.__patients = (
+            [list(booked) for booked in self.__patients]
+            if patients is None
+            else [[patients[p.id] for p in booked] for booked in self.__patients]
+        )
+        schedule.__by_hour = defaultdict(
+            list, {hour: list(ids) for hour, ids in self.__by_hour.items()}
+        )
+        schedule.__session_hours = list(self.__session_hours)
+        schedule.__by_type = {
+            patient_type: (list(hours), list(ids), tree.copy())
+            for patient_type, (hours, ids, tree) in self.__by_type.items()
+        }
+        schedule.__bookings = dict(self.__bookings)
+        schedule.__max_hour = self.__max_hour
+        schedule.__retired = self.__retired
+        schedule.__frame = None
+        return schedule
 
     def __process_slots(self, slots):
         """
@@ -56,117 +277,525 @@ class Schedule:
 
         self.__schedule = dict(sorted(self.__schedule.items()))
 
-    def __getitem__(self, time):
+    def __build_store(
+        self, hours, patient_types, hours_total, hours_remaining=None, patients=None
+    ):
         """
-        Retrieves the schedule for a specific hour, expanding the schedule if needed.
+        Builds the internal slot store from a template of slots covering one repeat period.
 
         Args:
-            time (int): The hour to retrieve the schedule for.
+            hours (ArrayLike): Start hour of each slot.
+            patient_types (ArrayLike): Patient type of each slot.
+            hours_total (ArrayLike): Length of each slot.
+            hours_remaining (ArrayLike, optional): Hours remaining per slot. Defaults to the slot totals.
+            patients (List[List[Any]], optional): Patients booked into each slot. Defaults to empty lists.
+        """
+        hours = np.asarray(hours)
+        if hours_remaining is None:
+            hours_remaining = hours_total
+        patients = (
+            [[] for _ in range(len(hours))] if patients is None else list(patients)
+        )
 
-        Returns:
-            pd.DataFrame: A DataFrame row corresponding to the specified hour.
+        order = np.argsort(hours, kind="stable")
+
+        self.__template = slot_template(
+            hours[order],
+            np.asarray(patient_types, dtype=object)[order],
+            np.asarray(hours_total)[order],
+        )
+        self.__period = (
+            int(self.lcm * (hours.max() // self.lcm + 1)) if len(hours) else self.lcm
+        )
+        self.__periods = 1
+
+        self.__hours = []
+        self.__types = []
+        self.__totals = []
+        self.__remaining = []
+        self.__patients = []
+        self.__by_hour = defaultdict(list)
+        self.__session_hours = []
+        self.__by_type = {}
+        self.__bookings = {}
+        self.__max_hour = 0
+        self.__retired = 0
+        self.__frame = None
+
+        self.__add_slots(
+            self.__template.hours,
+            self.__template.patient_types,
+            self.__template.hours_total,
+            np.asarray(hours_remaining)[order],
+            [patients[i] for i in order],
+        )
+
+    def __add_slots(self, hours, patient_types, hours_total, hours_remaining, patients):
         """
-        while time > max(self.__schedule):
-            multiple = max(self.__schedule) // self.lcm + 1
-            later_schedule = {
-                k + (self.lcm * multiple): v for k, v in self.__schedule.items()
-            }
-            self.__schedule |= later_schedule
+        Appends slots to the store and its hour and patient type indexes in one vectorised step.
 
-            df = self.__process_schedule(later_schedule)
-            self.processed_schedule = pd.concat(
-                [self.processed_schedule, df]
-            ).reset_index(drop=True)
+        Slots must be added in hour order, after every slot already in the store.
 
-        return self.processed_schedule.loc[(self.processed_schedule["hour"] == time), :]
+        Args:
+            hours (np.ndarray): Start hour of each slot.
+            patient_types (np.ndarray): Patient type of each slot, as an object array.
+            hours_total (np.ndarray): Length of each slot.
+            hours_remaining (np.ndarray): Unbooked time in each slot.
+            patients (List[List[Any]]): Patients booked into each slot.
+        """
+        if len(hours) == 0:
+            return
+
+        start = len(self.__hours)
+        slot_ids = np.arange(start, start + len(hours))
+        hour_list = hours.tolist()
+
+        self.__hours.extend(hour_list)
+        self.__types.extend(patient_types.tolist())
+        self.__totals.extend(hours_total.tolist())
+        self.__remaining.extend(hours_remaining.tolist())
+        self.__patients.extend(patients)
+
+        # Slots arrive in hour order, so each session is a run of slots with the same hour
+        bounds = np.flatnonzero(np.diff(hours)) + 1
+        for first, last in zip([0, *bounds.tolist()], [*bounds.tolist(), len(hours)]):
+            hour = hour_list[first]
+            if hour not in self.__by_hour:
+                self.__session_hours.append(hour)
+            self.__by_hour[hour].extend(range(start + first, start + last))
+
+        for slot_id, slot_patients in zip(slot_ids.tolist(), patients):
+            for patient in slot_patients:
+                self.__bookings[patient.id] = slot_id
+
+        # Patient types are indexed in order of their first slot
+        for patient_type in dict.fromkeys(patient_types.tolist()):
+            of_type = patient_types == patient_type
+            if patient_type not in self.__by_type:
+                self.__by_type[patient_type] = ([], [], _SlotTree())
+            type_hours, type_ids, tree = self.__by_type[patient_type]
+            type_hours.extend(hours[of_type].tolist())
+            type_ids.extend(slot_ids[of_type].tolist())
+            tree.extend(hours_remaining[of_type].tolist())
+
+        self.__max_hour = self.__hours[-1]
+        self.__frame = None
+
+    def __set_remaining(self, slot_id, hours_remaining):
+        """
+        Updates the hours remaining for a slot in the store and its patient type index.
 
-    def __process_schedule(self, schedule):
+        Args:
+            slot_id (int): Identifier of the slot.
+            hours_remaining (float): New unbooked time in the slot.
         """
-        Converts the internal schedule dictionary into a structured DataFrame.
+        self.__remaining[slot_id] = hours_remaining
+
+        _, ids, tree = self.__by_type[self.__types[slot_id]]
+        tree.update(bisect.bisect_left(ids, slot_id), hours_remaining)
+
+        self.__frame = None
+
+    def __extend(self, periods):
+        """
+        Extends the schedule horizon by a number of repeat periods in one bulk step.
+
+        Args:
+            periods (int): Number of repeat periods to add.
+        """
+        template = self.__template
+        if len(template.hours) == 0:
+            raise ValueError("Cannot extend a schedule with no slots.")
+
+        offsets = np.arange(self.__periods, self.__periods + periods) * self.__period
+        hours_total = np.tile(template.hours_total, periods)
+
+        self.__add_slots(
+            np.tile(template.hours, periods) + np.repeat(offsets, len(template.hours)),
+            np.tile(template.patient_types, periods),
+            hours_total,
+            hours_total,
+            [[] for _ in range(len(hours_total))],
+        )
+        self.__periods += periods
+
+    def extend_to(self, time):
+        """
+        Extends the schedule horizon so that it has slots up to at least the given hour.
+
+        Args:
+            time (float): The hour the schedule must reach.
+        """
+        if time <= self.__max_hour:
+            return
+
+        last_template_hour = (
+            self.__template.hours[-1] if len(self.__template.hours) else 0
+        )
+        periods = int(np.ceil((time - last_template_hour) / self.__period)) + 1
+
+        self.__extend(max(periods - self.__periods, 1))
+
+    def sessions(self, time):
+        """
+        Iterates over the distinct session start hours from a given time onwards, in order.
+
+        The horizon is extended whenever the iteration reaches the end of the schedule, so
+        sessions added by later extensions are included. A schedule with no slots to repeat has no
+        sessions, so yields nothing.
 
         Args:
-            schedule (Dict[int, List[Dict[str, float]]]): The internal schedule dictionary.
+            time (float): The earliest session start hour to yield.
+
+        Yields:
+            float: Session start hours, in increasing order.
+        """
+        position = bisect.bisect_left(self.__session_hours, time)
+        while True:
+            if position == len(self.__session_hours):
+                if len(self.__template.hours) == 0:
+                    return
+                self.__extend(self.__periods)
+            yield self.__session_hours[position]
+            position += 1
+
+    @property
+    def max_hour(self):
+        """
+        float: The latest slot start hour currently in the schedule.
+        """
+        return self.__max_hour
+
+    @property
+    def processed_schedule(self):
+        """
+        pd.DataFrame: The whole schedule, one row per slot, in hour order.
+
+        The DataFrame is only rebuilt when the schedule has changed since it was last requested.
+        The `patients` column holds the same list objects as the internal store.
+        """
+        if self.__frame is None:
+            self.__frame = self.__to_frame(range(len(self.__hours)))
+        return self.__frame
+
+    @processed_schedule.setter
+    def processed_schedule(self, df):
+        """
+        Replaces the schedule with the slots in a DataFrame.
+
+        Args:
+            df (pd.DataFrame): A DataFrame with columns for hour, patient type, durations, and assigned patients.
+        """
+        self.__build_store(
+            df["hour"],
+            df["patient_type"],
+            df["hours_total"],
+            df["hours_remaining"],
+            list(df["patients"]),
+        )
+
+    def __to_frame(self, slot_ids):
+        """
+        Converts slots in the internal store into a structured DataFrame.
+
+        Args:
+            slot_ids (Iterable[int]): Identifiers of the slots to include.
 
         Returns:
             pd.DataFrame: A structured DataFrame with columns for hour, patient type, duration, and assigned patients.
         """
-        df = pd.DataFrame(
-            [
-                [
-                    time,
-                    list(slot.keys())[0],
-                    list(slot.values())[0],
-                    list(slot.values())[0],
-                    [],
-                ]
-                for time, slots in schedule.items()
-                for slot in slots
-            ],
-            columns=[
-                "hour",
-                "patient_type",
-                "hours_total",
-                "hours_remaining",
-                "patients",
-            ],
-        )
-        return df
+        slot_ids = list(slot_ids)
+        return pd.DataFrame(
+            {
+                "hour": [self.__hours[i] for i in slot_ids],
+                "patient_type": [self.__types[i] for i in slot_ids],
+                "hours_total": [self.__totals[i] for i in slot_ids],
+                "hours_remaining": [self.__remaining[i] for i in slot_ids],
+                "patients": [self.__patients[i] for i in slot_ids],
+            },
+            columns=SCHEDULE_COLUMNS,
+            index=slot_ids,
+        )
+
+    def retire_before(self, time):
+        """
+        Releases the patient lists of the slots that finished by a time, for long runs.
+
+        Slots are retired in hour order, up to the first that has not finished, and keep their
+        hours in the store. Their patients are dropped from the slot and, if still booked into it,
+        from the bookings, so `processed_schedule` shows retired slots as empty.
+
+        Args:
+            time (float): The time slots must have finished by.
+
+        Returns:
+            slot_window: The slots retired by this call, with the patients they held, as
+                `slots_between` gives them.
+        """
+        first = self.__retired
+        while (
+            self.__retired < len(self.__hours)
+            and self.__hours[self.__retired] + self.__totals[self.__retired] <= time
+        ):
+            self.__retired += 1
+
+        slot_ids = range(first, self.__retired)
+        retired = self.__window(slot_ids)
+        for slot_id in slot_ids:
+            for patient in self.__patients[slot_id]:
+                if self.__bookings.get(patient.id) == slot_id:
+                    del self.__bookings[patient.id]
+            self.__patients[slot_id] = []
+
+        if first != self.__retired:
+            self.__frame = None
+        return retired
+
+    def slots_between(self, start, end):
+        """
+        Collects the slots starting in a time window as arrays.
+
+        Args:
+            start (float): Start of the window (inclusive).
+            end (float): End of the window (exclusive).
+
+        Returns:
+            slot_window: Slot identifiers, patient types, hours total and hours remaining as numpy
+                arrays, the patient lists of each slot and the start hours, in hour order.
+        """
+        self.extend_to(end)
+
+        slot_ids = [
+            slot_id
+            for hour in self.__session_hours[
+                bisect.bisect_left(self.__session_hours, start) : bisect.bisect_left(
+                    self.__session_hours, end
+                )
+            ]
+            for slot_id in self.__by_hour[hour]
+        ]
+
+        return self.__window(slot_ids)
+
+    def slots_at(self, time):
+        """
+        Collects the slots starting at a specific hour as arrays, expanding the schedule if needed.
+
+        Args:
+            time (float): The session start hour.
+
+        Returns:
+            slot_window: The slots starting at the hour, as `slots_between` gives them.
+        """
+        if time > self.__max_hour:
+            self.extend_to(time)
+
+        return self.__window(self.__by_hour.get(time, []))
+
+    def __window(self, slot_ids):
+        """
+        Gathers slots in the internal store into arrays.
+
+        Args:
+            slot_ids (Sequence[int]): Identifiers of the slots to include.
+
+        Returns:
+            slot_window: The slots' identifiers, patient types, hours total, hours remaining, patient
+                lists and start hours.
+        """
+        return slot_window(
+            np.array(slot_ids, dtype=int),
+            np.array([self.__types[i] for i in slot_ids], dtype=object),
+            np.array([self.__totals[i] for i in slot_ids], dtype=float),
+            np.array([self.__remaining[i] for i in slot_ids], dtype=float),
+            [self.__patients[i] for i in slot_ids],
+            np.array([self.__hours[i] for i in slot_ids], dtype=float),
+        )
+
+    def __getitem__(self, time):
+        """
+        Retrieves the schedule for a specific hour, expanding the schedule if needed.
+
+        Args:
+            time (int): The hour to retrieve the schedule for.
+
+        Returns:
+            pd.DataFrame: A DataFrame row corresponding to the specified hour.
+        """
+        if time > self.__max_hour:
+            self.extend_to(time)
+
+        return self.__to_frame(self.__by_hour.get(time, []))
 
     def schedule_patients(self, patients, time):
         """
         Assigns patients to available slots in the schedule.
 
         Args:
-            patients (List[Any]): A list of patient objects with attributes `id` and `surgery_duration`.
+            patients (List[Any]): A list of patient objects with attributes `id`, `patient_type` and `surgery_duration`.
+                Patients without a `patient_type` are matched to the slot type named in their `id`.
             time (int): The current simulation time.
         """
-        patient_types = self.processed_schedule["patient_type"].unique()
         for patient in patients:
-            patient_type = patient_types[
-                np.where(
-                    [patient_type in patient.id for patient_type in patient_types]
-                )[0]
-            ][0]
+            patient_type = self.__patient_type(patient)
+            hours, _, _ = self.__by_type[patient_type]
 
-            sub_df = self.__find_slot(patient_type, patient, time)
+            position = self.__first_fit(
+                patient_type, bisect.bisect_right(hours, time), patient
+            )
+            self.__book(patient_type, position, patient)
 
-            # if nothing matches in the schedule currently
-            if len(sub_df) == 0:
-                max_val = max(self.__schedule)
-                self[max_val + 1]
+    def book_patients(self, patients, time):
+        """
+        Books a list of patients, such as a waiting list, in one pass.
 
-                sub_df = self.__find_slot(patient_type, patient, time)
+        Patients get exactly the slots that `schedule_patients` would give them one at a time:
+        each takes the first slot after `time` with more hours remaining than their surgery
+        duration. The first slot after `time` is only looked up once per patient type. As hours
+        remaining only go down while booking, each search starts from the slot found for the
+        longest duration booked so far that is no longer than the patient's, which is usually the
+        slot they take. The slot trees are only rebuilt once, at the end.
 
-                if len(sub_df) == 0:
-                    raise ValueError(
-                        f"Surgery duration for patient {patient.id} is too long for any surgery slot with a duration of {patient.surgery_duration}."
+        Args:
+            patients (List[Any]): Patient objects with attributes `id`, `patient_type` and `surgery_duration`, in
+                booking order.
+            time (float): The current simulation time.
+        """
+        # Per patient type: booked durations in increasing order, and the slot found for each
+        sweeps = {}
+
+        try:
+            for patient in patients:
+                patient_type = self.__patient_type(patient)
+                if patient_type not in sweeps:
+                    hours, _, _ = self.__by_type[patient_type]
+                    sweeps[patient_type] = (
+                        [-np.inf],
+                        [bisect.bisect_right(hours, time)],
                     )
+                durations, positions = sweeps[patient_type]
+
+                duration = patient.surgery_duration
+                i = bisect.bisect_right(durations, duration)
+                position = self.__first_fit(patient_type, positions[i - 1], patient)
+                self.__book(patient_type, position, patient, update_tree=False)
+
+                # Keep positions increasing with duration, dropping the durations this supersedes
+                if durations[i - 1] == duration:
+                    i -= 1
+                j = i
+                while j < len(durations) and positions[j] <= position:
+                    j += 1
+                durations[i:j] = [duration]
+                positions[i:j] = [position]
+        finally:
+            for patient_type in sweeps:
+                _, ids, tree = self.__by_type[patient_type]
+                tree.assign([self.__remaining[slot_id] for slot_id in ids])
+
+    def __first_fit(self, patient_type, start, patient):
+        """
+        Finds the first slot of a patient type, from a position on, with room for a patient,
+        doubling the horizon once if no slot in the schedule has room.
+
+        Args:
+            patient_type (str): The type of patient.
+            start (int): First position, within the patient type's slots, to consider.
+            patient (Any): The patient object.
 
-            row_mask = self.processed_schedule.index == sub_df.index[0]
-            self.processed_schedule.loc[
-                row_mask, "hours_remaining"
-            ] -= patient.surgery_duration
-            logging.info(f"Scheduling {patient.id} for {self.processed_schedule.loc[row_mask, 'hour'].values[0]}")
-            self.processed_schedule.loc[row_mask, "patients"].values[0].append(patient)
+        Returns:
+            int: Position of the slot within the patient type's slots.
 
-    def __find_slot(self, patient_type, patient, time):
+        Raises:
+            ValueError: If the patient's surgery is too long for any slot.
         """
-        Finds a suitable slot for a patient based on type and duration.
+        position = self.__search(patient_type, start, patient.surgery_duration)
+
+        # if nothing matches in the schedule currently, double the horizon
+        if position is None:
+            self.__extend(self.__periods)
+
+            position = self.__search(patient_type, start, patient.surgery_duration)
+
+            if position is None:
+                raise ValueError(
+                    f"Surgery duration for patient {patient.id} is too long for any surgery slot with a duration of {patient.surgery_duration}."
+                )
+
+        return position
+
+    def __search(self, patient_type, start, duration):
+        """
+        Finds the first slot of a patient type, from a position on, with more hours remaining
+        than a duration.
+
+        The slot tree can only overstate hours remaining, while `book_patients` defers its
+        updates, so slots it offers are checked against the store.
+
+        Returns:
+            Optional[int]: Position of the slot within the patient type's slots, or None if no slot matches.
+        """
+        _, ids, tree = self.__by_type[patient_type]
+        remaining = self.__remaining
+
+        position = tree.first_greater(start, duration)
+        while position is not None and not remaining[ids[position]] > duration:
+            position = tree.first_greater(position + 1, duration)
+        return position
+
+    def __book(self, patient_type, position, patient, update_tree=True):
+        """
+        Books a patient into a slot, given its position within the patient type's slots.
 
         Args:
             patient_type (str): The type of patient.
+            position (int): Position of the slot within the patient type's slots.
+            patient (Any): The patient object.
+            update_tree (bool, optional): Update the slot tree too. Defaults to True.
+        """
+        _, ids, tree = self.__by_type[patient_type]
+        slot_id = ids[position]
+
+        hours_remaining = self.__remaining[slot_id] - patient.surgery_duration
+        self.__remaining[slot_id] = hours_remaining
+        if update_tree:
+            tree.update(position, hours_remaining)
+        self.__frame = None
+
+        logger.info("Scheduling %s for %s", patient.id, self.__hours[slot_id])
+        self.__patients[slot_id].append(patient)
+        self.__bookings[patient.id] = slot_id
+
+    def __patient_type(self, patient):
+        """
+        Finds the slot type a patient is booked into.
+
+        Args:
             patient (Any): The patient object.
-            time (int): The current simulation time.
 
         Returns:
-            pd.DataFrame: A filtered DataFrame of matching slots.
+            str: The patient's type, or the slot type named in their `id` if they have none.
         """
+        if patient.patient_type is not None:
+            return patient.patient_type.value
 
-        return self.processed_schedule.loc[
-            (self.processed_schedule["patient_type"] == patient_type)
-            & (self.processed_schedule["hours_remaining"] > patient.surgery_duration)
-            & (time < self.processed_schedule["hour"])
-        ]
+        return [
+            patient_type
+            for patient_type in self.__by_type
+            if patient_type in patient.id
+        ][0]
+
+    def patient_slot(self, patient):
+        """
+        Looks up the slot a patient is currently booked into.
+
+        Args:
+            patient (Any): The patient object.
+
+        Returns:
+            Optional[int]: Identifier of the slot (the `processed_schedule` index), or None if the patient is not booked.
+        """
+        return self.__bookings.get(patient.id)
 
     def find_patient(self, patient):
         """
@@ -178,9 +807,8 @@ class Schedule:
         Returns:
             pd.DataFrame: A DataFrame row where the patient is scheduled.
         """
-        return self.processed_schedule.loc[
-            self.processed_schedule["patients"].apply(lambda r: patient in r), :
-        ]
+        slot_id = self.__bookings.get(patient.id)
+        return self.__to_frame([] if slot_id is None else [slot_id])
 
     def cancel_patient(self, patient):
         """
@@ -189,12 +817,63 @@ class Schedule:
         Args:
             patient (Any): The patient object to cancel.
         """
-        p_df = self.find_patient(patient).patients.to_list()[0]
+        slot_id = self.__bookings.pop(patient.id)
+        self.__patients[slot_id].remove(patient)
+        self.__set_remaining(
+            slot_id, self.__remaining[slot_id] + patient.surgery_duration
+        )
+
+    def insert_patient(self, slot_id, patient, index=0):
+        """
+        Books a patient into a specific slot, ahead of the patients already in it.
 
-        idx = p_df.index(patient)
-        p_df.pop(idx)
+        The slot's hours remaining may go negative; the caller is expected to bump patients to
+        make room.
+
+        Args:
+            slot_id (int): Identifier of the slot (the `processed_schedule` index).
+            patient (Any): The patient object to book.
+            index (int, optional): Position in the slot's patient list. Defaults to 0.
+        """
+        self.__patients[slot_id].insert(index, patient)
+        self.__bookings[patient.id] = slot_id
+        self.__set_remaining(
+            slot_id, self.__remaining[slot_id] - patient.surgery_duration
+        )
+
+    def pop_patient(self, slot_id):
+        """
+        Removes the last patient booked into a slot.
+
+        Args:
+            slot_id (int): Identifier of the slot (the `processed_schedule` index).
+
+        Returns:
+            Any: The patient object removed from the slot.
+        """
+        patient = self.__patients[slot_id].pop()
+        if self.__bookings.get(patient.id) == slot_id:
+            del self.__bookings[patient.id]
+        self.__set_remaining(
+            slot_id, self.__remaining[slot_id] + patient.surgery_duration
+        )
+        return patient
 
 
 slot = namedtuple(
     "surgery_slot", ["start_time", "end_time", "patient_type", "repeat_period"]
 )
+
+slot_template = namedtuple("slot_template", ["hours", "patient_types", "hours_total"])
+
+slot_window = namedtuple(
+    "slot_window",
+    [
+        "slot_ids",
+        "patient_types",
+        "hours_total",
+        "hours_remaining",
+        "patients",
+        "hours",
+    ],
+)
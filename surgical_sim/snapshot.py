@@ -0,0 +1,113 @@
+import numpy as np
+import simpy
+
+from .experiment import EmpiricalExperiment
+from .metrics import MetricsRecorder
+from .model import (book_waiting_lists, build_schedule, patient_generators,
+                    schedule_layout, start_processes, theatre_slots)
+from .resources import WardResource, bed_preload
+
+__all__ = ["ModelSnapshot"]
+
+
+class ModelSnapshot:
+    """
+    The state of a replication once it has been initialised, from which scenario runs can be forked.
+
+    Initialisation samples the patients already on the ward and generates and books every patient
+    on the waiting lists. A snapshot does this once, and each fork copies the resulting bookings,
+    patients, breach tracker and random streams, so scenarios that differ only in beds,
+    critical care beds, maximum emergency wait, bed-aware planning or run length skip it. Forks of a snapshot give
+    exactly the same results as `single_run` with the same seed and config.
+
+    Snapshots are taken at the end of initialisation, before the simulation runs: patients part
+    way through surgery or recovery are held by SimPy processes, which cannot be copied.
+
+    Attributes:
+        config (RunConfig): The scenario parameters the snapshot was initialised with.
+        seed (int): Seed of the replication.
+        time (float): Simulation time of the snapshot.
+        ward_los (np.ndarray): Remaining length of stay of each patient on the ward.
+    """
+
+    def __init__(self, inputs, config, seed, schedule=None):
+        """
+        Initialises a replication and captures its state.
+
+        Args:
+            inputs (ModelInputs): The model inputs.
+            config (RunConfig): The scenario parameters.
+            seed (int): Seed for the replication's experiment.
+            schedule (Schedule, optional): An empty schedule to use. Defaults to one built from `inputs` and `config`.
+        """
+        if schedule is None:
+            schedule = build_schedule(theatre_slots(inputs, config))
+
+        experiment = EmpiricalExperiment(
+            inputs.parameters,
+            seed=seed,
+            max_emergency_wait=config.max_emergency_wait,
+        )
+        env = simpy.Environment()
+
+        self.ward_los = np.atleast_1d(
+            experiment.remaining_los_dist.sample(inputs.initial_occupancy)
+        )
+        book_waiting_lists(
+            env, inputs, experiment, schedule, patient_generators(experiment)
+        )
+
+        self.config = config
+        self.seed = seed
+        self.time = env.now
+
+        self.__experiment = experiment
+        self.__schedule = schedule
+
+    def fork(self, config=None):
+        """
+        Runs a scenario from the snapshot, leaving the snapshot unchanged.
+
+        Args:
+            config (RunConfig, optional): The scenario parameters. Must have the same theatre schedule layout
+                (additional capacity) as the snapshot. Defaults to the snapshot's config.
+
+        Returns:
+            Tuple[EmpiricalExperiment, Schedule, MetricsRecorder]: The experiment, schedule and metrics after the run.
+        """
+        if config is None:
+            config = self.config
+        if schedule_layout(config) != schedule_layout(self.config):
+            raise ValueError(
+                "Cannot fork a scenario with a different theatre schedule from the snapshot."
+            )
+
+        experiment = self.__experiment.copy()
+        schedule = self.__schedule.copy({p.id: p for p in experiment.patients})
+        generators = patient_generators(experiment)
+
+        experiment.max_emergency_wait = config.max_emergency_wait
+        experiment.breach_tracker.set_max_wait(config.max_emergency_wait)
+
+        metrics = MetricsRecorder()
+        env = simpy.Environment(initial_time=self.time)
+
+        beds = WardResource(env, capacity=config.num_beds)
+        cc_beds = simpy.Resource(env, capacity=config.num_cc_beds)
+
+        for time_remaining in self.ward_los:
+            env.process(bed_preload(env, beds, time_remaining, metrics))
+        start_processes(
+            env,
+            beds,
+            cc_beds,
+            experiment,
+            schedule,
+            generators,
+            metrics,
+            config.bed_aware_planning,
+        )
+
+        env.run(until=config.run_length)
+
+        return experiment, schedule, metrics
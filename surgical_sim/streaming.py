@@ -0,0 +1,199 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .metrics import MetricsChannel
+from .model import OCCUPANCY_CHANNELS
+from .patients import PatientTable
+from .resources import WardResource
+
+__all__ = ["RunStream"]
+
+
+def _append_csv(path, frame):
+    """
+    Appends rows to a CSV file, writing the header only when the file is new.
+    """
+    frame.to_csv(path, mode="a", header=not path.exists(), index=False)
+
+
+def _window_occupancy(times, values, base, start, end):
+    """
+    Summarises the step function of +1/-1 events over a window.
+
+    Args:
+        times (np.ndarray): Event times in the window.
+        values (np.ndarray): Event values.
+        base (float): Occupancy at the start of the window.
+        start (float): Start of the window.
+        end (float): End of the window.
+
+    Returns:
+        Tuple[float, float, float]: The time-weighted mean, the peak and the final occupancy.
+    """
+    order = np.lexsort((values, times))
+    times = times[order]
+    totals = base + values[order].cumsum()
+
+    last = np.append(times[1:] != times[:-1], True)[: len(times)]
+    levels = np.concatenate([[base], totals[last]])
+    durations = np.diff(np.concatenate([[start], times[last], [end]]))
+
+    held = levels[durations > 0]
+    peak = held.max() if len(held) else levels[-1]
+    mean = levels @ durations / (end - start) if end > start else levels[-1]
+    return mean, peak, levels[-1]
+
+
+class RunStream:
+    """
+    Retires the finished parts of a run at each daily planning tick, so memory stays flat however
+    long the run is.
+
+    At each tick, discharged patients are dropped from the experiment, slots that have finished
+    are retired from the schedule, and the events before the tick are removed from the metrics
+    channels. The occupancy channels are kept as a daily mean, peak and closing occupancy, and the
+    ward's occupancy timeline is cut back to the tick. The `RunSummary` counters are kept as the run
+    goes, so the run's summary is unchanged; the patients, schedule and step functions left at the
+    end of the run only cover what has not been retired.
+
+    Given a directory, the retired patients, slots and events are also appended to CSV files in it,
+    so the whole run can be rebuilt afterwards.
+
+    Example:
+        stream = RunStream("results/year")
+        _, _, metrics = single_run(inputs, RunConfig(run_length=365 * 24), seed, stream=stream)
+        metrics.summary.record(), stream.to_frame()
+
+    Attributes:
+        directory (Optional[Path]): Where retired patients, slots and events are written, if anywhere.
+        retired_to (float): Time of the last tick.
+        patients_retired (int): Number of patients dropped so far.
+        slots_retired (int): Number of slots retired so far.
+        events_retired (int): Number of metrics events removed so far.
+        occupancy (List[Dict[str, float]]): The mean, peak and closing occupancy of each occupancy channel
+            between each pair of ticks.
+    """
+
+    def __init__(self, directory=None):
+        """
+        Initializes the stream.
+
+        Args:
+            directory (Optional[Union[str, Path]]): Directory to append retired patients (`patients.csv`),
+                slots (`slots.csv`) and events (`events.csv`) to. Defaults to not writing them.
+        """
+        self.directory = None if directory is None else Path(directory)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.retired_to = 0.0
+        self.patients_retired = 0
+        self.slots_retired = 0
+        self.events_retired = 0
+        self.occupancy = []
+
+    def retire(self, env, experiment, schedule, metrics=None, beds=None):
+        """
+        Retires everything that finished before the current time.
+
+        Args:
+            env (simpy.Environment): The simulation environment.
+            experiment (Any): The experiment, with its list of patients.
+            schedule (Schedule): The schedule.
+            metrics (Optional[MetricsRecorder]): The run's metrics.
+            beds (Optional[WardResource]): The ward beds, whose occupancy timeline is cut back.
+        """
+        now = env.now
+        if now <= self.retired_to:
+            return
+
+        discharged = [p for p in experiment.patients if p.discharge_time is not None]
+        if discharged:
+            experiment.patients[:] = [
+                p for p in experiment.patients if p.discharge_time is None
+            ]
+            self.patients_retired += len(discharged)
+
+        slots = schedule.retire_before(now)
+        self.slots_retired += len(slots.slot_ids)
+
+        channels = (
+            {}
+            if metrics is None
+            else {
+                key: channel
+                for key, channel in metrics.items()
+                if isinstance(channel, MetricsChannel)
+            }
+        )
+        occupancy_keys = {key: name for name, key in OCCUPANCY_CHANNELS.items()}
+
+        events = []
+        for key, channel in channels.items():
+            base = channel.base
+            times, values = channel.retire(now)
+            self.events_retired += len(times)
+
+            if key in occupancy_keys:
+                mean, peak, closing = _window_occupancy(
+                    times, values, base, self.retired_to, now
+                )
+                self.occupancy.append(
+                    {
+                        "channel": occupancy_keys[key],
+                        "start": self.retired_to,
+                        "end": now,
+                        "mean": mean,
+                        "peak": peak,
+                        "closing": closing,
+                    }
+                )
+            if self.directory is not None:
+                events.append(
+                    pd.DataFrame({"channel": key, "time": times, "value": values})
+                )
+
+        if isinstance(beds, WardResource):
+            beds.retire(now)
+
+        if self.directory is not None:
+            if discharged:
+                _append_csv(
+                    self.directory / "patients.csv",
+                    PatientTable(discharged).to_frame(),
+                )
+            if len(slots.slot_ids):
+                _append_csv(
+                    self.directory / "slots.csv",
+                    pd.DataFrame(
+                        {
+                            "slot_id": slots.slot_ids,
+                            "hour": slots.hours,
+                            "patient_type": slots.patient_types,
+                            "hours_total": slots.hours_total,
+                            "hours_remaining": slots.hours_remaining,
+                            "patients": [
+                                ";".join(p.id for p in patients)
+                                for patients in slots.patients
+                            ],
+                        }
+                    ),
+                )
+            if events:
+                _append_csv(self.directory / "events.csv", pd.concat(events))
+
+        self.retired_to = now
+
+    def to_frame(self):
+        """
+        Tabulates the occupancy kept between ticks.
+
+        Returns:
+            pd.DataFrame: The mean, peak and closing occupancy, indexed by channel and window start.
+        """
+        return pd.DataFrame(
+            self.occupancy,
+            columns=["channel", "start", "end", "mean", "peak", "closing"],
+        ).set_index(["channel", "start"])
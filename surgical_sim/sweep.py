@@ -0,0 +1,264 @@
+import dataclasses
+import hashlib
+import itertools
+import json
+import logging
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .model import ModelInputs, RunConfig
+from .runner import ReplicationResults, _run_tasks, replication_seeds
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "ResultCache",
+    "SweepResults",
+    "input_fingerprint",
+    "replication_key",
+    "run_sweep",
+    "scenario_grid",
+]
+
+
+def scenario_grid(base=RunConfig(), **axes):
+    """
+    Builds every combination of the given parameter values.
+
+    Example:
+        scenario_grid(num_beds=[50, 60, 70], max_emergency_wait=[1, 2, 4])
+
+    Args:
+        base (RunConfig, optional): The parameters shared by every scenario. Defaults to RunConfig().
+        **axes (Iterable): Values for each `RunConfig` field to vary.
+
+    Returns:
+        List[RunConfig]: One config per combination, with the last axis varying fastest.
+    """
+    names = list(axes)
+    return [
+        dataclasses.replace(base, **dict(zip(names, values)))
+        for values in itertools.product(*axes.values())
+    ]
+
+
+def input_fingerprint(inputs):
+    """
+    Hashes the model inputs, so that cached results are not reused after the input data changes.
+
+    Args:
+        inputs (ModelInputs): The model inputs.
+
+    Returns:
+        str: A hex digest of the inputs.
+    """
+    digest = hashlib.sha256()
+
+    for name, table in inputs.parameters.tables().items():
+        digest.update(name.encode())
+        for values in [table.cdf, table.lower, table.upper]:
+            if values is not None:
+                digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+
+    for frame in [
+        inputs.theatre_schedule,
+        inputs.wait_list,
+        inputs.emergency_wait_list,
+    ]:
+        digest.update(",".join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+
+    digest.update(str(inputs.initial_occupancy).encode())
+
+    return digest.hexdigest()
+
+
+def replication_key(config, seed, fingerprint):
+    """
+    Builds the cache key of one replication.
+
+    Args:
+        config (RunConfig): The scenario parameters.
+        seed (int): The replication seed.
+        fingerprint (str): The fingerprint of the model inputs.
+
+    Returns:
+        str: A hex digest of the config, seed and input fingerprint.
+    """
+    payload = json.dumps(
+        {"config": dataclasses.asdict(config), "seed": seed, "inputs": fingerprint},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    An on-disk store of replication results, one file per replication.
+
+    Attributes:
+        directory (Path): The directory holding the cached results.
+    """
+
+    def __init__(self, directory):
+        """
+        Initializes the cache, creating its directory if needed.
+
+        Args:
+            directory (Union[str, Path]): The directory to store results in.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def __contains__(self, key):
+        return self.__path(key).exists()
+
+    def get(self, key):
+        """
+        Loads a cached result.
+
+        Args:
+            key (str): The replication key.
+
+        Returns:
+            Optional[replication_result]: The cached result, or None if it is not in the cache.
+        """
+        try:
+            with open(self.__path(key), "rb") as fin:
+                return pickle.load(fin)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, result):
+        """
+        Stores a result, replacing any previous one atomically.
+
+        Args:
+            key (str): The replication key.
+            result (replication_result): The result to store.
+        """
+        path = self.__path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as fout:
+            pickle.dump(result, fout, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+
+class SweepResults:
+    """
+    The results of a scenario sweep.
+
+    Attributes:
+        scenarios (List[ReplicationResults]): The replications of each scenario, in sweep order.
+    """
+
+    def __init__(self, scenarios):
+        """
+        Initializes the results.
+
+        Args:
+            scenarios (List[ReplicationResults]): The replications of each scenario.
+        """
+        self.scenarios = scenarios
+
+    def __len__(self):
+        return len(self.scenarios)
+
+    def __iter__(self):
+        return iter(self.scenarios)
+
+    def to_frame(self):
+        """
+        Converts the summary metrics into one long DataFrame.
+
+        Returns:
+            pd.DataFrame: One row per scenario and replication, with the scenario parameters, replication
+                seed and each summary metric.
+        """
+        frames = []
+        for scenario in self.scenarios:
+            # The replication seeds identify the root seed, so only those are kept
+            params = dataclasses.asdict(scenario.config)
+            del params["seed"]
+
+            frame = scenario.to_frame()
+            frames.append(
+                pd.concat([pd.DataFrame(params, index=frame.index), frame], axis=1)
+            )
+
+        return pd.concat(frames, ignore_index=True)
+
+
+def run_sweep(configs, n=100, workers=None, inputs=None, cache_dir=None, chunksize=1):
+    """
+    Runs replications of every scenario in a sweep, reusing cached results.
+
+    Every replication that is not in the cache is put into a single task queue, so the pool works
+    through the whole grid at once rather than scenario by scenario. Results are cached by the
+    scenario parameters, replication seed and input data, so extending a sweep only runs the new
+    scenarios or replications.
+
+    Args:
+        configs (Iterable[RunConfig]): The scenarios, e.g. from `scenario_grid`.
+        n (int, optional): Number of replications per scenario. Defaults to 100.
+        workers (Optional[int]): Number of worker processes. Defaults to the number of CPUs; 1 runs in this process.
+        inputs (ModelInputs, optional): The model inputs. Defaults to those in the repository's `data/` directory.
+        cache_dir (Optional[Union[str, Path]]): Directory to cache results in. Defaults to no caching.
+        chunksize (int, optional): Number of replications sent to a worker at a time. Defaults to 1.
+
+    Returns:
+        SweepResults: The results of every scenario, in the order given.
+    """
+    if inputs is None:
+        inputs = ModelInputs.from_directory()
+
+    configs = list(configs)
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    fingerprint = input_fingerprint(inputs)
+
+    scenario_results = []
+    pending = {}
+    for config in configs:
+        results = []
+        for seed in replication_seeds(config.seed, n):
+            key = replication_key(config, seed, fingerprint)
+            result = cache.get(key) if cache is not None else None
+            if result is None:
+                pending.setdefault(key, (config, seed))
+            results.append((key, result))
+        scenario_results.append(results)
+
+    logger.info(
+        "Sweep of %d scenarios: running %d replications, %d cached",
+        len(configs),
+        len(pending),
+        len(configs) * n - len(pending),
+    )
+
+    # Cache each result as it arrives, so an interrupted sweep keeps what it has run
+    new_results = {}
+    for key, result in zip(
+        pending, _run_tasks(list(pending.values()), inputs, workers, chunksize)
+    ):
+        if cache is not None:
+            cache.put(key, result)
+        new_results[key] = result
+
+    return SweepResults(
+        [
+            ReplicationResults(
+                config,
+                [
+                    result if result is not None else new_results[key]
+                    for key, result in results
+                ],
+            )
+            for config, results in zip(configs, scenario_results)
+        ]
+    )